@@ -19,6 +19,7 @@ benchmark_info_dict = {
 
 # Information that needs to be stored here
     # Number of stages
+    # The CPS flags that are changed before each stage ("stage_cps_flags", one dict per stage)
     # Which MPs should be outputted
 
 
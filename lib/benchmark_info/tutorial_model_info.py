@@ -7,7 +7,8 @@ small_strain_oedometer_modify_cps_flags = {
 # Information about the sliding blocks
 small_strain_oedometer_info = {
     "num_stages" : 1,
-    "modify_cps_flags" : small_strain_oedometer_modify_cps_flags
+    "modify_cps_flags" : small_strain_oedometer_modify_cps_flags,
+    "stage_cps_flags" : [{}]
 }
 
 #------------- EndSmall Strain Oedometer -------------#
@@ -20,7 +21,8 @@ triaxial_modify_cps_flags = {
 # Information about the sliding blocks
 triaxial_info = {
     "num_stages" : 1,
-    "modify_cps_flags" : triaxial_modify_cps_flags
+    "modify_cps_flags" : triaxial_modify_cps_flags,
+    "stage_cps_flags" : [{}]
 }
 #------------- End 3D Triaixal -------------#
 
@@ -37,7 +39,9 @@ sliding_blocks_modify_cps_flags = {
 # Information about the sliding blocks
 sliding_blocks_info = {
     "num_stages" : 2,
-    "modify_cps_flags" : sliding_blocks_modify_cps_flags
+    "modify_cps_flags" : sliding_blocks_modify_cps_flags,
+    # The CPS flags changed before each stage
+    "stage_cps_flags" : [{}, sliding_blocks_modify_cps_flags]
 }
 #------------- End Sliding Blocks -------------#
 
@@ -54,7 +58,9 @@ column_collapse_modify_cps_flags = {
 # Information about the sliding blocks
 column_collapse_info = {
     "num_stages" : 2,
-    "modify_cps_flags" : column_collapse_modify_cps_flags
+    "modify_cps_flags" : column_collapse_modify_cps_flags,
+    # The CPS flags changed before each stage
+    "stage_cps_flags" : [{}, column_collapse_modify_cps_flags]
 }
 #------------- End Column Collapse Info -------------# 
 
@@ -67,6 +73,7 @@ shallow_fndn_modify_cps_flags = {
 # Information about the sliding blocks
 shallow_fndn_info = {
     "num_stages" : 1,
-    "modify_cps_flags" : shallow_fndn_modify_cps_flags
+    "modify_cps_flags" : shallow_fndn_modify_cps_flags,
+    "stage_cps_flags" : [{}]
 }
 #------------- End Shallow Fndn info -------------#
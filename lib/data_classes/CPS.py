@@ -0,0 +1,140 @@
+import os
+import re
+import tempfile
+
+SECTION_PATTERN = re.compile(r"^\$\$([^\n]*)\n?", re.M)
+
+
+def normalize_cps_key(key):
+    # Purpose: Accept keys with or without the leading $$ (e.g. "$$NUMBER_OF_LOADSTEPS" or "NUMBER_OF_LOADSTEPS")
+    key = key.strip()
+    if key.startswith("$$"):
+        key = key[2:]
+    return key.strip()
+
+
+class cps_file:
+    # Purpose: Hold the $$KEY -> value blocks of a .CPS_ file so many values can be changed with one read and write
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path
+
+        # Text before the first $$ key, e.g. ### Anura3D_2024 ###
+        self.header = ""
+
+        # Ordered list of [key as written in the file, value text], the value can span several lines
+        self.sections = []
+        self._index = {}
+
+        if file_path is not None:
+            self.read(file_path)
+
+    def __str__(self):
+        return f"CPS File: {self.file_path} \nKeys: {len(self.sections)}"
+
+    def __contains__(self, key):
+        return normalize_cps_key(key) in self._index
+
+    def keys(self):
+        # Purpose: Get the keys (without $$) in the order of the file
+        return [key.strip() for key, _ in self.sections]
+
+    def read(self, file_path):
+        # Purpose: Parse all of the $$KEY blocks of the file at once
+        with open(file_path, "r") as file:
+            text = file.read()
+        self.file_path = file_path
+
+        matches = list(SECTION_PATTERN.finditer(text))
+        self.header = text[:matches[0].start()] if matches else text
+        self.sections = []
+        self._index = {}
+
+        for i, match in enumerate(matches):
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+            key = match.group(1)
+            self._index[key.strip()] = len(self.sections)
+            self.sections.append([key, text[match.end():end].rstrip("\n")])
+
+    def get(self, key, dtype=None):
+        """
+        Get the value of a key.
+
+        Parameters:
+        - key: The key with or without the leading $$.
+        - dtype: If None the value text is returned. Otherwise each whitespace separated entry is converted
+                 with dtype, a single entry gives a scalar and several entries a list (e.g. "1 0.05" -> [1.0, 0.05]).
+
+        Returns:
+        - The value of the key.
+        """
+        name = normalize_cps_key(key)
+        if name not in self._index:
+            raise KeyError(f"Key '$${name}' not found in the CPS file '{self.file_path}'")
+
+        value = self.sections[self._index[name]][1]
+        if dtype is None:
+            return value
+
+        entries = [dtype(entry) for entry in value.split()]
+        return entries[0] if len(entries) == 1 else entries
+
+    def set(self, key, value, add=False):
+        """
+        Set the value of a key.
+
+        Parameters:
+        - key: The key with or without the leading $$.
+        - value: A string, a number or a list of values (written separated by spaces).
+        - add: Add the key before $$END if it isn't in the file, otherwise an unknown key raises a KeyError.
+        """
+        name = normalize_cps_key(key)
+
+        if isinstance(value, (list, tuple)):
+            value = " ".join(str(entry) for entry in value)
+        value = str(value)
+
+        if name not in self._index:
+            if not add:
+                raise KeyError(f"Key '$${name}' not found in the CPS file '{self.file_path}'")
+            position = self._index.get("END", len(self.sections))
+            self.sections.insert(position, [name, value])
+            self._index = {section_key.strip(): i for i, (section_key, _) in enumerate(self.sections)}
+            return
+
+        self.sections[self._index[name]][1] = value
+
+    def update(self, values, add=False):
+        # Purpose: Set many keys at once, all keys are checked before any value is changed
+        if not add:
+            unknown = [key for key in values if normalize_cps_key(key) not in self._index]
+            if unknown:
+                raise KeyError(f"Keys not found in the CPS file '{self.file_path}': {', '.join(unknown)}")
+
+        for key, value in values.items():
+            self.set(key, value, add=add)
+
+    def to_string(self):
+        # Purpose: Create the text of the CPS file
+        parts = [self.header]
+        for key, value in self.sections:
+            parts.append(f"$${key}\n" if not value else f"$${key}\n{value}\n")
+        return "".join(parts)
+
+    def write(self, file_path=None):
+        # Purpose: Write the CPS file in one go, by default over the file it was read from
+        # The file is written to a temporary file first and then renamed so it is never half written
+        # The temporary name doesn't contain .CPS_ so it is never picked up as a stage file
+        file_path = file_path or self.file_path
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)), prefix=".cps_write_", suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w") as file:
+                file.write(self.to_string())
+            if os.path.exists(file_path):
+                os.chmod(temp_path, os.stat(file_path).st_mode)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.file_path = file_path
@@ -0,0 +1,177 @@
+import os
+import re
+import numpy as np
+
+# Sections that hold the mesh and are stored as arrays
+NODES_KEY = "STARTNODES"
+ELEMENTS_KEY = "STARTELEMCON"
+COUNTERS_KEY = "STARTCOUNTERS"
+
+# Section that starts the block of each material
+MATERIAL_START_KEY = "MATERIAL_INDEX"
+
+SECTION_PATTERN = re.compile(r"^\$\$([^\n]*)\n?", re.M)
+
+
+class gom_file:
+    # Purpose: Hold the content of a .GOM file, with the nodes and element connectivity as NumPy arrays
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path
+
+        # Text before the first $$ section, e.g. ### Anura3D_2024 ###
+        self.header = ""
+
+        # Ordered list of [key, content] of the sections, the mesh and materials are kept in the attributes below
+        self.sections = []
+
+        # Node coordinates (num_nodes x dimension) and 1-based element connectivity (num_elements x nodes per element)
+        self.nodes = np.zeros((0, 2))
+        self.elements = np.zeros((0, 3), dtype=np.int64)
+
+        # Materials by name, each a dict of the section name (without $$) to the value
+        self.materials = {}
+
+        # Original spelling of the material keys (some have trailing spaces) and the text of the mesh sections
+        self._raw_material_keys = {}
+        self._original_mesh = {}
+        self._original_arrays = {}
+
+        if file_path is not None:
+            self.read(file_path)
+
+    def __str__(self):
+        return f"GOM File: {self.file_path} \nNodes: {len(self.nodes)} \nElements: {len(self.elements)} \nMaterials: {list(self.materials)}"
+
+    def read(self, file_path):
+        # Purpose: Parse a .GOM file in a single pass over its sections
+        with open(file_path, "r") as file:
+            text = file.read()
+        self.file_path = file_path
+
+        matches = list(SECTION_PATTERN.finditer(text))
+        self.header = text[:matches[0].start()] if matches else text
+        self.sections = []
+        self.materials = {}
+        self._raw_material_keys = {}
+        self._original_mesh = {}
+
+        material_list = []
+        current_material = None
+        for i, match in enumerate(matches):
+            key = match.group(1)
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+            content = text[match.end():end].rstrip("\n")
+            name = key.strip()
+
+            # The material blocks run from a $$MATERIAL_INDEX until the next $$START... section
+            if name == MATERIAL_START_KEY:
+                if not material_list:
+                    self.sections.append(["__MATERIALS__", None])
+                current_material = {}
+                material_list.append(current_material)
+            elif current_material is not None and name.startswith("START"):
+                current_material = None
+
+            if current_material is not None:
+                current_material[name] = content.strip()
+                self._raw_material_keys[name] = key
+            elif name == NODES_KEY or name == ELEMENTS_KEY:
+                self._original_mesh[name] = content
+                self.sections.append([name, None])
+            else:
+                self.sections.append([key, content])
+
+        self.materials = {material.get("MATERIAL_NAME", material[MATERIAL_START_KEY]): material for material in material_list}
+
+        self._parse_mesh()
+
+    def _parse_mesh(self):
+        # Purpose: Convert the node and element sections to arrays without creating an object per line
+        counters = np.fromstring(self.get_section(COUNTERS_KEY) or "", dtype=np.int64, sep=" ")
+        num_elements, num_nodes = (int(counters[0]), int(counters[1])) if len(counters) >= 2 else (None, None)
+
+        node_values = np.fromstring(self._original_mesh.get(NODES_KEY, ""), dtype=float, sep=" ")
+        if num_nodes is None:
+            dimension = 3 if (self.get_section("DIMENSION") or "").startswith("3D") else 2
+            num_nodes = len(node_values) // dimension
+        self.nodes = node_values.reshape(num_nodes, -1) if num_nodes else np.zeros((0, 2))
+
+        element_values = np.fromstring(self._original_mesh.get(ELEMENTS_KEY, ""), dtype=np.int64, sep=" ")
+        if num_elements is None:
+            num_elements = len(element_values) // self.nodes_per_element()
+        self.elements = element_values.reshape(num_elements, -1) if num_elements else np.zeros((0, 3), dtype=np.int64)
+
+        # Keep a copy to detect whether the mesh was changed before writing
+        self._original_arrays = {NODES_KEY: self.nodes.copy(), ELEMENTS_KEY: self.elements.copy()}
+
+    def nodes_per_element(self):
+        # Purpose: Get the number of nodes per element from the $$ELEMENTTYPE section (e.g. triangular_3-noded)
+        match = re.search(r"(\d+)-noded", self.get_section("ELEMENTTYPE") or "")
+        if match:
+            return int(match.group(1))
+        return self.elements.shape[1] if self.elements.ndim == 2 else 3
+
+    def get_section(self, key):
+        # Purpose: Get the text of a section (without $$), None if the file doesn't have it
+        for section_key, content in self.sections:
+            if section_key.strip() == key:
+                return content
+        return None
+
+    def set_section(self, key, content):
+        # Purpose: Set the text of a section (without $$)
+        if key in (NODES_KEY, ELEMENTS_KEY):
+            raise ValueError(f"Set the '{key}' section through the nodes and elements arrays")
+        for section in self.sections:
+            if section[0].strip() == key:
+                section[1] = content
+                return
+        raise KeyError(f"Section '{key}' not found in the GOM file")
+
+    def _format_mesh(self, key, array, fmt):
+        # Purpose: Write the mesh arrays, unchanged arrays are written with their original text
+        original = self._original_arrays.get(key)
+        if original is not None and key in self._original_mesh and np.array_equal(original, array):
+            return self._original_mesh[key]
+        if len(array) == 0:
+            return ""
+
+        # Format the whole array with one string operation instead of a call per row
+        row_format = " ".join([fmt] * array.shape[1])
+        return "\n".join([row_format] * array.shape[0]) % tuple(array.ravel().tolist())
+
+    def to_string(self):
+        # Purpose: Create the text of the .GOM file
+        parts = [self.header]
+        for key, content in self.sections:
+            name = key.strip()
+            if name == "__MATERIALS__":
+                for material in self.materials.values():
+                    for material_key, value in material.items():
+                        parts.append(f"$${self._raw_material_keys.get(material_key, material_key)}\n{value}\n")
+                continue
+
+            if name == NODES_KEY:
+                content = self._format_mesh(NODES_KEY, self.nodes, "%.17g")
+            elif name == ELEMENTS_KEY:
+                content = self._format_mesh(ELEMENTS_KEY, self.elements, "%d")
+            elif name == COUNTERS_KEY:
+                # Keep the counters consistent with the mesh arrays
+                values = content.split()
+                values[:2] = [str(len(self.elements)), str(len(self.nodes))]
+                content = " ".join(values)
+
+            parts.append(f"$${key}\n" if not content else f"$${key}\n{content}\n")
+
+        return "".join(parts)
+
+    def write(self, file_path=None):
+        # Purpose: Write the .GOM file, by default over the file it was read from
+        # The file is written to a temporary file first and then renamed so it is never half written
+        file_path = file_path or self.file_path
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(self.to_string())
+        os.replace(temp_path, file_path)
+        self.file_path = file_path
@@ -0,0 +1,444 @@
+import os
+import itertools
+import numpy as np
+
+from lib.data_classes.GOM import gom_file
+from lib.data_classes.CPS import cps_file
+from lib.general_functions.spatial_index import box_grid, mesh_index
+
+# Markers at the start and the end of a binary GiD mesh file
+GID_MESHSET_MAGIC = b"GID_MESHSET"
+GID_MESHSET_END = b"END_GID_MESHSET"
+
+# A node of the binary mesh: id, two flags, two reserved values and the x, y, z coordinates
+NODE_RECORD = np.dtype([("id", "<i8"), ("flags", "<i4", 2), ("reserved", "<i8", 2), ("coordinates", "<f8", 3)])
+
+# Words of an element record before its nodes: id, five reserved values, layer and one reserved value
+ELEMENT_RECORD_WORDS = 8
+
+# Element types of GiD
+GID_ELEMENT_TYPES = {1: "point", 2: "linear", 3: "triangle", 4: "quadrilateral", 5: "tetrahedra",
+                     6: "hexahedra", 7: "prism", 8: "pyramid", 9: "sphere", 10: "circle"}
+
+# GOM sections with a line per element
+ELEMENT_SECTIONS = ["STARTELMMAT", "STARTDAMPING", "START_NUMBER_OF_MATERIAL_POINTS"]
+
+
+class gid_mesh_file:
+    # Purpose: Read the binary mesh (.msh, GID_MESHSET) of a GiD project into NumPy arrays
+    #
+    # The file holds a table of nodes followed by a block of elements for each meshed surface or volume, and
+    # the nodes of the geometric points. GiD writes the blocks in the order of the element ids.
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path
+
+        # Node ids and x, y, z coordinates (num_nodes x 3)
+        self.node_ids = np.zeros(0, dtype=np.int64)
+        self.nodes = np.zeros((0, 3))
+
+        # A dict for each element block with the "element_type", the "element_ids" and the "connectivity" (node ids)
+        self.blocks = []
+
+        # Geometric point id and node id of each geometric point (num_points x 2)
+        self.point_nodes = np.zeros((0, 2), dtype=np.int64)
+
+        if file_path is not None:
+            self.read(file_path)
+
+    def __str__(self):
+        return f"GiD Mesh: {self.file_path} \nNodes: {len(self.nodes)} \nElement blocks: {[len(block['element_ids']) for block in self.blocks]}"
+
+    def read(self, file_path):
+        # Purpose: Parse the binary mesh without a Python object per node or element
+        with open(file_path, "rb") as file:
+            data = file.read()
+        self.file_path = file_path
+
+        name_length = int(np.frombuffer(data, dtype="<i4", count=1, offset=8)[0])
+        if not data[12:12 + name_length].startswith(GID_MESHSET_MAGIC) or not data.rstrip(b"\0").endswith(GID_MESHSET_END):
+            raise ValueError(f"'{file_path}' is not a binary GiD mesh file (GID_MESHSET)")
+        position = 12 + name_length
+
+        num_nodes = int(np.frombuffer(data, dtype="<i4", count=1, offset=position)[0])
+        position += 4
+        records = np.frombuffer(data, dtype=NODE_RECORD, count=num_nodes, offset=position)
+        position += num_nodes * NODE_RECORD.itemsize
+        self.node_ids = records["id"].astype(np.int64)
+        self.nodes = records["coordinates"].copy()
+
+        # The rest of the file is 32 bit words, the node table is closed by a 0
+        words = np.frombuffer(data, dtype="<i4", count=(len(data) - position) // 4, offset=position)
+        p = 1
+        self.blocks = []
+        while p + 6 <= len(words):
+            # Block header: element type, dimension, nodes per element, number of nodes, number of elements, 0
+            element_type, _, nodes_per_element, block_nodes, num_elements, _ = (int(value) for value in words[p:p + 6])
+            if element_type not in GID_ELEMENT_TYPES or block_nodes != num_nodes or num_elements <= 0 or nodes_per_element <= 0:
+                break
+            p += 6
+
+            record_words = ELEMENT_RECORD_WORDS + nodes_per_element
+            rows = words[p:p + num_elements * record_words].reshape(num_elements, record_words)
+            p += num_elements * record_words
+            self.blocks.append({
+                "element_type": GID_ELEMENT_TYPES[element_type],
+                "element_ids": rows[:, 0].astype(np.int64),
+                "connectivity": rows[:, ELEMENT_RECORD_WORDS:].astype(np.int64),
+            })
+
+            # Block trailer: 0, 1, 3 and the number of the block
+            p += 4
+
+        # The nodes of the geometric points: 0, the number of points and (1, node id, point id) for each point
+        if p + 2 <= len(words) and words[p] == 0:
+            num_points = int(words[p + 1])
+            points = words[p + 2:p + 2 + 3 * num_points].reshape(num_points, 3)
+            self.point_nodes = points[:, [2, 1]].astype(np.int64)
+
+        if not self.blocks:
+            raise ValueError(f"No elements found in '{file_path}'")
+
+    def get_mesh(self):
+        """
+        Get the mesh in the numbering of a .GOM file.
+
+        Returns:
+        - The node coordinates (num_nodes x 3), the 1-based element connectivity ordered by element id and the
+          block number of each element. The nodes are numbered by their position in the node table.
+        """
+        order = np.argsort(self.node_ids, kind="stable")
+        sorted_ids = self.node_ids[order]
+
+        element_ids = np.concatenate([block["element_ids"] for block in self.blocks])
+        connectivity = np.concatenate([block["connectivity"] for block in self.blocks])
+        block_numbers = np.concatenate([np.full(len(block["element_ids"]), i) for i, block in enumerate(self.blocks)])
+
+        element_order = np.argsort(element_ids, kind="stable")
+        elements = order[np.searchsorted(sorted_ids, connectivity[element_order])] + 1
+        return self.nodes, elements, block_numbers[element_order]
+
+
+def _locate_in_simplices(points, vertices, tolerance, chunk_size=250000):
+    """
+    Find a simplex (point, segment, triangle or tetrahedron) that contains each point.
+
+    The bounding boxes of the simplices are put in a box_grid, so each point is only tested against the
+    simplices near it. The elements of a mesh are located with a mesh_index instead, this function is for
+    simplices of a lower dimension than the points (e.g. the boundary edges of a 2D mesh).
+
+    Parameters:
+    - points: Coordinates of the points (num_points x dimension).
+    - vertices: Vertices of the simplices (num_simplices x vertices per simplex x dimension).
+    - tolerance: Distance within which a point is on a simplex.
+    - chunk_size: Number of points that are tested at a time.
+
+    Returns:
+    - The index of a containing simplex for each point (-1 if there is none) and the barycentric coordinates
+      of the points in that simplex (num_points x vertices per simplex).
+    """
+    num_points, num_vertices = len(points), vertices.shape[1]
+    found = np.full(num_points, -1, dtype=np.int64)
+    weights = np.zeros((num_points, num_vertices))
+    if len(vertices) == 0 or num_points == 0:
+        return found, weights
+
+    # Local coordinates of a point are pinv(edges) @ (point - first vertex), the distance to the simplex is the residual
+    origins = vertices[:, 0]
+    edges = np.transpose(vertices[:, 1:] - origins[:, None], (0, 2, 1))
+    inverse = np.linalg.pinv(edges) if num_vertices > 1 else np.zeros((len(vertices), 0, points.shape[1]))
+
+    # Allow a small negative local coordinate for points on the boundary of the simplex
+    scale = np.linalg.norm(edges, axis=1).max(axis=1) if num_vertices > 1 else np.zeros(len(vertices))
+    margin = tolerance / np.maximum(scale, tolerance)
+
+    # The boxes are grown by the tolerance so points within it of a simplex are paired with it
+    grid = box_grid(vertices.min(axis=1) - tolerance, vertices.max(axis=1) + tolerance)
+    for start in range(0, num_points, chunk_size):
+        chunk = points[start:start + chunk_size]
+        pair_points, candidates = grid.candidates(chunk)
+
+        offsets = chunk[pair_points] - origins[candidates]
+        local = np.einsum("pij,pj->pi", inverse[candidates], offsets)
+        residual = offsets - np.einsum("pji,pi->pj", edges[candidates], local)
+        inside = np.linalg.norm(residual, axis=1) <= tolerance
+        if num_vertices > 1:
+            inside &= np.all(local >= -margin[candidates, None], axis=1) & (local.sum(axis=1) <= 1 + margin[candidates])
+
+        # The simplex with the lowest number that contains a point wins, like a search in order
+        pair_numbers = np.flatnonzero(inside)
+        pair_numbers = pair_numbers[np.lexsort((candidates[pair_numbers], pair_points[pair_numbers]))]
+        matched, first = np.unique(pair_points[pair_numbers], return_index=True)
+        pair_numbers = pair_numbers[first]
+
+        found[start + matched] = candidates[pair_numbers]
+        chosen = local[pair_numbers]
+        weights[start + matched] = np.column_stack([1 - chosen.sum(axis=1), chosen])
+
+    return found, weights
+
+
+def _block_boundary_facets(elements, block_numbers, facet_size):
+    # Purpose: Get the facets (node tuples of facet_size) that belong to a single element of their block
+    combinations = list(itertools.combinations(range(elements.shape[1]), facet_size))
+    facets = np.sort(elements[:, combinations].reshape(-1, facet_size), axis=1)
+    blocks = np.repeat(block_numbers, len(combinations))
+
+    keys = np.column_stack([blocks, facets])
+    unique, counts = np.unique(keys, axis=0, return_counts=True)
+    return np.unique(unique[counts == 1, 1:], axis=0)
+
+
+def _select_line_edges(edges, group_nodes, is_point, coordinates):
+    """
+    Choose the boundary edges that carry each group of a line condition.
+
+    Only the nodes of a condition are known, so an edge between two nodes of a group doesn't always belong to a line
+    with that condition, e.g. the edge between two corners of a wall that are fixed by the walls next to it. A node
+    that isn't a geometric point lies on a single line, so its edges decide for themselves. Edges between two
+    geometric points are added if they continue a line of the group in the same direction, or if one of their
+    nodes isn't explained by another edge of the group.
+
+    Parameters:
+    - edges: The boundary edges (num_edges x 2, 1-based node numbers).
+    - group_nodes: A list with the array of node numbers of each group.
+    - is_point: Boolean array that is True for the nodes at geometric points.
+    - coordinates: The node coordinates.
+
+    Returns:
+    - A list with the array of edges of each group.
+    """
+    directions = coordinates[edges[:, 1] - 1] - coordinates[edges[:, 0] - 1]
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+
+    selected = []
+    for nodes in group_nodes:
+        member = np.zeros(len(coordinates), dtype=bool)
+        member[nodes - 1] = True
+        candidates = np.flatnonzero(member[edges - 1].all(axis=1))
+        certain = ~is_point[edges[candidates] - 1].all(axis=1)
+        chosen = list(candidates[certain])
+        uncertain = list(candidates[~certain])
+
+        # Extend the lines of the group over edges in the same direction
+        extended = True
+        while extended and uncertain and chosen:
+            extended = False
+            for edge in list(uncertain):
+                neighbours = np.array(chosen)[np.isin(edges[chosen], edges[edge]).any(axis=1)]
+                if np.any(np.abs(directions[neighbours] @ directions[edge]) > 1 - 1e-9):
+                    chosen.append(edge)
+                    uncertain.remove(edge)
+                    extended = True
+
+        # Add the remaining edges for nodes that aren't explained by another edge
+        explained = np.zeros(len(coordinates), dtype=bool)
+        explained[edges[chosen].ravel() - 1] = True
+        for edge in uncertain:
+            if not explained[edges[edge] - 1].all():
+                chosen.append(edge)
+                explained[edges[edge] - 1] = True
+
+        selected.append(edges[np.array(chosen, dtype=np.int64)])
+    return selected
+
+
+class gid_project:
+    # Purpose: Create the .GOM and .CPS_001 files of a model from its GiD project without GiD
+    #
+    # The mesh is read from the binary .msh file. The conditions, materials and calculation settings are taken from
+    # the files GiD wrote at the last "calculate" (<name>-1.dat is the CPS and <name>-2.dat the GOM). If the model was
+    # meshed again after that, the sections that refer to nodes and elements are moved to the new mesh by their
+    # location: a node gets the fixities of the point, line or surface it lies on, line loads are interpolated
+    # along their edges and each element block gets the material of the part of the old mesh it covers.
+
+    def __init__(self, gid_folder, model_name=None):
+        self.gid_folder = gid_folder
+        self.model_name = model_name or os.path.splitext(os.path.basename(os.path.normpath(gid_folder)))[0]
+        self.mesh = gid_mesh_file(self._path(".msh"))
+
+        for suffix in ("-1.dat", "-2.dat"):
+            if not os.path.exists(self._path(suffix)):
+                raise FileNotFoundError(f"'{self._path(suffix)}' not found, calculate the project in GiD once to create it")
+
+    def __str__(self):
+        return f"GiD Project: {self.gid_folder} \nModel Name: {self.model_name} \n{self.mesh}"
+
+    def _path(self, suffix):
+        return os.path.join(self.gid_folder, f"{self.model_name}{suffix}")
+
+    def to_gom(self):
+        """
+        Create the .GOM content of the current mesh.
+
+        Returns:
+        - A gom_file with the mesh of the .msh file and the other sections of <name>-2.dat.
+        """
+        gom = gom_file(self._path("-2.dat"))
+        template_nodes, template_elements = gom.nodes, gom.elements
+        dimension = template_nodes.shape[1]
+
+        nodes, elements, block_numbers = self.mesh.get_mesh()
+        nodes = nodes[:, :dimension]
+
+        gom.nodes = nodes
+        gom.elements = elements
+        if template_nodes.shape == nodes.shape and template_elements.shape == elements.shape \
+                and np.array_equal(template_nodes, nodes) and np.array_equal(template_elements, elements):
+            # Same mesh as at the last calculate, all sections are still valid
+            return gom
+
+        if elements.shape[1] != dimension + 1 or template_elements.shape[1] != dimension + 1:
+            raise ValueError("Only meshes of linear triangles (2D) or tetrahedra (3D) can be moved to a new mesh")
+
+        extent = np.ptp(np.vstack([template_nodes, nodes]), axis=0)
+        tolerance = 1e-8 * max(float(np.linalg.norm(extent)), 1.0)
+
+        # The old mesh has no block numbers, its elements are split into regions by their materials
+        template_blocks = self._template_block_numbers(gom, template_elements)
+
+        # Nodes of the old mesh at the geometric points of the current mesh
+        point_ids = self.mesh.point_nodes[:, 1]
+        point_coordinates = self.mesh.nodes[np.isin(self.mesh.node_ids, point_ids), :dimension]
+        found, _ = _locate_in_simplices(template_nodes, point_coordinates[:, None, :], tolerance)
+        is_point = found >= 0
+
+        for key, content in gom.sections:
+            name = key.strip()
+            if content is None or name in ELEMENT_SECTIONS:
+                continue
+            if name.startswith("START_FIXITY_") or name.startswith("START_REMOVE_FIXITY_"):
+                kind = name.split("_")[-2]
+                content = self._remap_node_section(content, kind, template_nodes, template_elements, template_blocks, is_point, nodes, tolerance)
+            elif name.startswith("START_LOAD_ON"):
+                content = self._remap_edge_section(content, template_nodes, nodes, elements, block_numbers, tolerance)
+            elif name == "START_OUTPUT_REACTION_FORCES" and content.strip() not in ("", "0"):
+                raise ValueError(f"The section '{name}' can't be moved to a new mesh")
+            else:
+                continue
+            gom.set_section(name, content)
+
+        # Each new element block takes the values of the old element that contains its first element
+        centroids = np.array([nodes[elements[block_numbers == i][0] - 1].mean(axis=0) for i in range(len(self.mesh.blocks))])
+        found, _ = mesh_index(template_nodes, template_elements).locate(centroids)
+        if np.any(found < 0):
+            raise ValueError("The new mesh covers an area that the old mesh doesn't, calculate the project in GiD again")
+
+        for name in ELEMENT_SECTIONS:
+            content = gom.get_section(name)
+            if content is None:
+                continue
+            lines = np.array(content.split("\n"))
+            gom.set_section(name, "\n".join(lines[found[block_numbers]]))
+
+        return gom
+
+    def _template_block_numbers(self, gom, template_elements):
+        # Purpose: Split the old elements into regions by their material values, the boundaries of these regions hold the line conditions
+        values = [gom.get_section(name) for name in ELEMENT_SECTIONS if gom.get_section(name) is not None]
+        if not values:
+            return np.zeros(len(template_elements), dtype=np.int64)
+        rows = ["|".join(row) for row in zip(*(content.split("\n") for content in values))]
+        return np.unique(rows, return_inverse=True)[1]
+
+    def _remap_node_section(self, content, kind, template_nodes, template_elements, template_blocks, is_point, nodes, tolerance):
+        # Purpose: Give each new node the records of the old point, line or surface it lies on
+        lines = content.split("\n")
+        count = int(lines[0])
+        if count == 0:
+            return content
+
+        # Group the old nodes by the values of their record (e.g. "1 0" for a fixed x direction)
+        groups = {}
+        for line in lines[1:1 + count]:
+            node, values = line.split(None, 1)
+            groups.setdefault(values, set()).add(int(node))
+
+        group_nodes = [np.array(sorted(nodes_of_group)) for nodes_of_group in groups.values()]
+        dimension = template_nodes.shape[1]
+        if kind == "LINE" and dimension == 2:
+            edges = _block_boundary_facets(template_elements, template_blocks, 2)
+            supports = _select_line_edges(edges, group_nodes, is_point, template_nodes)
+        elif kind == "LINE":
+            faces = _block_boundary_facets(template_elements, template_blocks, 3)
+            edges = np.unique(np.sort(faces[:, [[0, 1], [1, 2], [0, 2]]].reshape(-1, 2), axis=1), axis=0)
+            supports = [edges[np.isin(edges, nodes_of_group).all(axis=1)] for nodes_of_group in group_nodes]
+        elif kind == "SURFACE":
+            faces = template_elements if dimension == 2 else _block_boundary_facets(template_elements, template_blocks, 3)
+            supports = [faces[np.isin(faces, nodes_of_group).all(axis=1)] for nodes_of_group in group_nodes]
+        else:
+            supports = [np.zeros((0, 1), dtype=np.int64)] * len(group_nodes)
+
+        records = []
+        for group_index, values in enumerate(groups):
+            # A new node gets the record if it is at an old node of the group or on one of its supports
+            found, _ = _locate_in_simplices(nodes, template_nodes[group_nodes[group_index] - 1][:, None, :], tolerance)
+            on_support = found >= 0
+            if len(supports[group_index]):
+                found, _ = _locate_in_simplices(nodes, template_nodes[supports[group_index] - 1], tolerance)
+                on_support |= found >= 0
+
+            records.extend((node, group_index, f"{node} {values}") for node in np.flatnonzero(on_support) + 1)
+
+        records.sort()
+        return "\n".join([str(len(records))] + [record for _, _, record in records])
+
+    def _remap_edge_section(self, content, template_nodes, nodes, elements, block_numbers, tolerance):
+        # Purpose: Split the loaded edges of the old mesh over the boundary edges of the new mesh that lie on them
+        lines = content.split("\n")
+        count = int(lines[0])
+        if count == 0:
+            return content
+
+        dimension = template_nodes.shape[1]
+        if dimension != 2:
+            raise ValueError("Loads on faces of 3D meshes can't be moved to a new mesh")
+
+        new_edges = _block_boundary_facets(elements, block_numbers, 2)
+        records = []
+        for line in lines[1:1 + count]:
+            values = line.split()
+            start, end = int(values[0]) - 1, int(values[1]) - 1
+            start_load = np.array(values[2:2 + dimension], dtype=float)
+            end_load = np.array(values[2 + dimension:2 + 2 * dimension], dtype=float)
+
+            segment = template_nodes[[start, end]][None]
+            found, weights = _locate_in_simplices(nodes, segment, tolerance)
+
+            # Position of each new node along the old edge (0 at its start, 1 at its end)
+            position = np.where(found >= 0, weights[:, 1], np.nan)
+            edge_positions = position[new_edges - 1]
+            on_edge = ~np.isnan(edge_positions).any(axis=1)
+
+            for (a, b), (t_a, t_b) in zip(new_edges[on_edge], edge_positions[on_edge]):
+                if t_a > t_b:
+                    a, b, t_a, t_b = b, a, t_b, t_a
+                load_a = start_load + t_a * (end_load - start_load)
+                load_b = start_load + t_b * (end_load - start_load)
+                records.append(" ".join([str(a), str(b)] + [f"{value:.10g}" for value in np.concatenate([load_a, load_b])]))
+
+        return "\n".join([str(len(records))] + records)
+
+    def write(self, a3d_folder, cps_overrides=None):
+        """
+        Write the .GOM and .CPS_001 files of the model into a .A3D folder.
+
+        Parameters:
+        - a3d_folder: The folder to write the files to, it is created if it doesn't exist.
+        - cps_overrides: Optional dictionary of CPS keys to values (see cps_file.update).
+
+        Returns:
+        - The paths of the .GOM and the .CPS_001 file.
+        """
+        os.makedirs(a3d_folder, exist_ok=True)
+        gom_path = os.path.join(a3d_folder, f"{self.model_name}.GOM")
+        cps_path = os.path.join(a3d_folder, f"{self.model_name}.CPS_001")
+
+        self.to_gom().write(gom_path)
+
+        cps = cps_file(self._path("-1.dat"))
+        if cps_overrides:
+            cps.update(cps_overrides)
+        cps.write(cps_path)
+
+        return gom_path, cps_path
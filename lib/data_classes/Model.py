@@ -1,8 +1,17 @@
 import os
+import re
+import glob
+import asyncio
 
 from lib.benchmark_info.run_benchmarks_info import benchmark_info_dict
 from lib.general_functions.general_functions import run_executable, get_highest_file,  delete_files_with_extensions
-from lib.general_functions.general_functions import overwrite_line_after_string
+from lib.general_functions.progress_monitor import monitor_executable
+from lib.general_functions.resource_profiler import resource_profiler
+from lib.data_classes.GOM import gom_file
+from lib.data_classes.CPS import cps_file
+from lib.general_functions.stage_manifest import hash_bytes, hash_file, load_manifest, save_manifest
+from lib.general_functions.result_cache import result_cache, snapshot_folder
+from lib.general_functions.retention import MODEL_INPUT_EXTENSIONS, apply_retention_policy, keep_extensions_rules, print_retention_report
 
 # Import information about the benchmarks
 
@@ -24,6 +33,20 @@ class model:
         # Init a variable to store the stage that has been run
         self.current_stage = 0
 
+        # Optional file that the kernel output is written to and the exit status of the last stage
+        self.log_file = None
+        self.return_code = None
+
+        # Optional environment variables for the kernel, e.g. the OpenMP settings of the kernel_scheduler
+        self.environment = None
+
+        # Resource usage of the kernel (peak RSS and CPU time) for each stage that has been run
+        self.resource_usage = []
+
+        # Time series and summary of the last stage that was run with run_stage_profiled
+        self.resource_profile = None
+        self.resource_summary = None
+
         if self.benchmark:
             # Get the information about the bench mark
             self.load_benchmark_info()
@@ -44,7 +67,69 @@ class model:
     def run_stage(self):
         
         # Purpose: Run a stage of the model 
-        run_executable(self.exe_path, self.model_path)
+        usage = {}
+        self.return_code = run_executable(self.exe_path, self.model_path, self.log_file, usage, self.environment)
+        self.resource_usage.append(usage)
+
+    def load_GOM(self):
+        # Purpose: Load the .GOM file of the model with the mesh as NumPy arrays
+        return gom_file(f"{self.model_path}.GOM")
+
+    def get_number_of_loadsteps(self):
+        # Purpose: Get the number of load steps of the stage that runs next from the last CPS file
+        last_CPS = get_highest_file(self.model_folder, ".CPS_")
+        if last_CPS is None:
+            return None
+
+        try:
+            return cps_file(os.path.join(self.model_folder, last_CPS)).get("NUMBER_OF_LOADSTEPS", int)
+        except (KeyError, ValueError):
+            return None
+
+    async def monitor_stage(self, poll_interval=0.5, profiler=None):
+        # Purpose: Run a stage of the model and yield progress events while it runs
+        # Usage: async for event in model.monitor_stage(): ... (breaking out of the loop kills the kernel)
+        # An optional resource_profiler samples the resource usage of the kernel
+        result = {}
+        monitor = monitor_executable(self.exe_path, self.model_path,
+                                     out_file=f"{self.model_path}.OUT",
+                                     total_steps=self.get_number_of_loadsteps(),
+                                     log_file=self.log_file,
+                                     poll_interval=poll_interval,
+                                     result=result,
+                                     profiler=profiler,
+                                     env=self.environment)
+        try:
+            async for event in monitor:
+                yield event
+        finally:
+            await monitor.aclose()
+            self.return_code = result.get("return_code")
+
+    def run_stage_with_progress(self, callback, poll_interval=0.5, profiler=None):
+        # Purpose: Run a stage of the model and call callback(event) for each progress event
+        # The kernel is killed if the callback returns False
+        async def run():
+            monitor = self.monitor_stage(poll_interval, profiler)
+            try:
+                async for event in monitor:
+                    if callback(event) is False:
+                        break
+            finally:
+                await monitor.aclose()
+
+        asyncio.run(run())
+        return self.return_code
+
+    def run_stage_profiled(self, interval=0.5, callback=None):
+        # Purpose: Run a stage of the model while sampling the CPU time, RSS, threads and I/O of the kernel (Linux only)
+        # The samples are stored in resource_profile, with the load step that was running, and summarized in resource_summary
+        profiler = resource_profiler(interval)
+        self.run_stage_with_progress(callback if callback is not None else (lambda event: None), profiler=profiler)
+
+        self.resource_profile = profiler.time_series()
+        self.resource_summary = profiler.summary()
+        return self.resource_summary
 
     def modify_CPS(self, from_user_file = False, which_file = "last"):
         # Purpose: Modify the cps file can be used to do the next stage of a model
@@ -65,32 +150,161 @@ class model:
                 # Create the file dir
                 cps_file_dir = os.path.join(self.model_folder, last_CPS)
 
-                # Loop over the flags that need to be modfied and modify them
-                for flag, new_value in cps_modify_flags.items():
-                    overwrite_line_after_string(cps_file_dir, flag, new_value)
+                # Modify all of the flags with a single read and write of the file
+                # Flags without a value (e.g. "No changes needed") are skipped
+                cps = cps_file(cps_file_dir)
+                cps.update({flag: new_value for flag, new_value in cps_modify_flags.items() if new_value is not None})
+                cps.write()
             print(f"Modified {cps_file_dir}")
 
-    def run_benchmark(self):
-        # Purpose: Run a benchmark in one go
+    def get_stage_cps_flags(self, stage):
+        # Purpose: Get the CPS flags that are changed before a stage (stages are counted from 1)
+        if "stage_cps_flags" in self.benchmark_info:
+            cps_flags = self.benchmark_info["stage_cps_flags"][stage - 1]
+        elif stage > 1:
+            # Older benchmark definitions only give the flags of the second stage
+            cps_flags = self.benchmark_info["modify_cps_flags"]
+        else:
+            cps_flags = {}
 
-        # Run the first stage
-        self.run_stage()
-        
-        # Increment the current stage
-        self.current_stage += 1
-
-        if self.num_stages == 2:
-            # Modify the CPS file
-            self.modify_CPS()
-            print("hello BOB")
-            # Run the second stage
+        # Flags without a value (e.g. "No changes needed") are skipped
+        return {flag: new_value for flag, new_value in cps_flags.items() if new_value is not None}
+
+    def get_stage_cps_files(self):
+        # Purpose: Get the CPS files of the model folder by their stage number
+        pattern = re.compile(re.escape(f"{self.model_name}.CPS_") + r"(\d+)$")
+        with os.scandir(self.model_folder) as entries:
+            return {int(match.group(1)): entry.name for entry in entries
+                    if entry.is_file() and (match := pattern.match(entry.name)) is not None}
+
+    def remove_stage_files(self, stage, manifest):
+        # Purpose: Delete the result files of a stage and the stages after it so the stage can run again
+        # The kernel runs the CPS file with the highest number, so the CPS files of the later stages are deleted as well
+        stage_cps_files = self.get_stage_cps_files()
+        keep = {name for number, name in stage_cps_files.items() if number <= stage}
+        remove = {name for number, name in stage_cps_files.items() if number > stage}
+        for key, record in manifest["stages"].items():
+            if int(key) >= stage:
+                remove.update(record.get("output_files") or [])
+
+        for file in sorted(remove - keep):
+            file_path = os.path.join(self.model_folder, file)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    def get_manifest_path(self):
+        # Purpose: Get the file that records the stages that have been run
+        return f"{self.model_path}.stages.json"
+
+    def run_benchmark(self, resume = True):
+        # Purpose: Run all of the stages of a benchmark in one go
+        # With resume, stages whose inputs and outputs are unchanged since their last successful run are skipped
+        # A stage is only skipped if the result files it wrote (e.g. the PAR and OUT files) still exist
+
+        manifest_path = self.get_manifest_path()
+        manifest = load_manifest(manifest_path) if resume else {"stages": {}}
+        exe_fingerprint = hash_file(self.exe_path)
+        gom_fingerprint = hash_file(f"{self.model_path}.GOM")
+
+        self.current_stage = 0
+        self.resource_usage = []
+        for stage in range(1, self.num_stages + 1):
+            # Each stage reads the CPS file with its number, later ones are written by the kernel
+            stage_cps = f"{self.model_path}.CPS_{stage:03d}"
+            next_cps = f"{self.model_path}.CPS_{stage + 1:03d}"
+            if not os.path.exists(stage_cps):
+                raise FileNotFoundError(f"The CPS file '{stage_cps}' for stage {stage} does not exist.")
+
+            # Apply the stage flags in memory so the fingerprint is known before anything is written
+            cps = cps_file(stage_cps)
+            cps_flags = self.get_stage_cps_flags(stage)
+            cps.update(cps_flags)
+            input_fingerprint = hash_bytes(cps.to_string().encode(), (gom_fingerprint or "").encode(), (exe_fingerprint or "").encode())
+
+            record = manifest["stages"].get(str(stage))
+            if (record is not None and record["input_fingerprint"] == input_fingerprint
+                    and record["output_fingerprint"] == hash_file(next_cps)
+                    and record.get("output_files") is not None
+                    and all(os.path.exists(os.path.join(self.model_folder, file)) for file in record["output_files"])):
+                print(f"Stage {stage} is unchanged, skipping it")
+                self.current_stage = stage
+                continue
+
+            # The stage runs again so the records and the files of this and later stages are no longer valid
+            self.remove_stage_files(stage, manifest)
+            manifest["stages"] = {key: value for key, value in manifest["stages"].items() if int(key) < stage}
+            save_manifest(manifest_path, manifest)
+
+            if cps_flags:
+                cps.write()
+                print(f"Modified {stage_cps}")
+
+                # The previous stage wrote this CPS file, record the modified version as its output
+                if str(stage - 1) in manifest["stages"]:
+                    manifest["stages"][str(stage - 1)]["output_fingerprint"] = hash_file(stage_cps)
+                    save_manifest(manifest_path, manifest)
+
+            # The result files of the stage are the files that are new or changed after it ran
+            before = snapshot_folder(self.model_folder)
             self.run_stage()
-        elif self.num_stages > 2:
-            raise ValueError("running more than two stages is not implemented")
+            if self.return_code != 0:
+                raise RuntimeError(f"Stage {stage} failed with exit status {self.return_code}")
+            after = snapshot_folder(self.model_folder)
+            manifest_name = os.path.basename(manifest_path)
+            output_files = sorted(file for file, stat in after.items() if before.get(file) != stat and file != manifest_name)
+
+            manifest["stages"][str(stage)] = {
+                "input_fingerprint": input_fingerprint,
+                "output_fingerprint": hash_file(next_cps),
+                "output_files": output_files,
+            }
+            save_manifest(manifest_path, manifest)
+            self.current_stage = stage
+
         print("Model Complete!")
         
-    def delete_folder_files(self, keep_extensions = ['.CPS_001', '.GOM', '.dll', '.out', '.exe']):
+    def run_benchmark_cached(self, cache = None):
+        # Purpose: Restore the results of an identical earlier run from the cache, or run the benchmark and cache its results
+        if cache is None:
+            cache = result_cache()
+
+        key = cache.model_key(self)
+        if cache.restore(key, self.model_folder):
+            self.current_stage = self.num_stages
+            self.return_code = 0
+            print("Model results restored from the cache!")
+            return True
+
+        # The output files are the files that are new or changed after the run, so every stage has to run
+        # from the input files (the kernel runs the CPS file with the highest number)
+        self.reset_to_inputs()
+        before = snapshot_folder(self.model_folder)
+        self.run_benchmark(resume=False)
+        after = snapshot_folder(self.model_folder)
+        output_files = [file for file, stat in after.items() if before.get(file) != stat]
+
+        # An empty entry would "restore" a run without results
+        if not output_files:
+            raise RuntimeError(f"The run of '{self.model_name}' produced no output files, nothing was cached")
+
+        cache.store(key, self.model_folder, output_files)
+        return False
+
+    def reset_to_inputs(self):
+        # Purpose: Delete every file of the model folder except the input files and the kernel
+        # The kernel is kept even if it doesn't have an input extension (e.g. a Linux build)
+        rules = keep_extensions_rules(MODEL_INPUT_EXTENSIONS)
+        exe_name = os.path.relpath(self.exe_path, self.model_folder)
+        if os.path.dirname(exe_name) == "" and exe_name != os.pardir:
+            rules.insert(0, {"pattern": glob.escape(exe_name), "action": "keep"})
+        return apply_retention_policy(self.model_folder, rules)
+
+    def delete_folder_files(self, keep_extensions = MODEL_INPUT_EXTENSIONS):
         # Purpose: Delete all files in a folder except those with a certain extentension
         delete_files_with_extensions(self.model_folder, keep_extensions)
-            
 
+    def apply_retention_policy(self, rules, default_action = "keep", dry_run = False, compression = "gzip"):
+        # Purpose: Delete or compress the output files of the model folder according to retention rules (see retention.py)
+        report = apply_retention_policy(self.model_folder, rules, default_action, dry_run, compression)
+        print_retention_report(report)
+        return report
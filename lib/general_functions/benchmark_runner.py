@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.data_classes.Model import model
+
+
+def relocate_path(path, source_folder, target_folder):
+    # Purpose: Point a path inside of source_folder to the same file in target_folder, other paths are returned unchanged
+    path = os.path.abspath(path)
+    source_folder = os.path.abspath(source_folder)
+    if os.path.commonpath([path, source_folder]) == source_folder:
+        return os.path.join(target_folder, os.path.relpath(path, source_folder))
+    return path
+
+
+def copy_model_to_scratch(benchmark_model, scratch_dir):
+    """
+    Copy the .A3D folder of a model into its own scratch directory and create a model that runs there.
+
+    Parameters:
+    - benchmark_model: The model object to copy.
+    - scratch_dir: The directory in which the copy is made.
+
+    Returns:
+    - A model object that points to the copied folder.
+    """
+    # Give each job its own directory so that runs of the same benchmark (or a reused scratch_dir) can't collide
+    os.makedirs(scratch_dir, exist_ok=True)
+    run_dir = tempfile.mkdtemp(prefix=f"{benchmark_model.benchmark_name}_", dir=scratch_dir)
+    model_folder = os.path.join(run_dir, os.path.basename(os.path.normpath(benchmark_model.model_folder)))
+    shutil.copytree(benchmark_model.model_folder, model_folder)
+
+    # Use the copied executable if it lives inside of the model folder
+    exe_path = relocate_path(benchmark_model.exe_path, benchmark_model.model_folder, model_folder)
+
+    scratch_model = model(exe_path, model_folder, benchmark_model.model_name,
+                          benchmark=True, benchmark_name=benchmark_model.benchmark_name)
+    scratch_model.log_file = os.path.join(run_dir, f"{benchmark_model.benchmark_name}.log")
+
+    return scratch_model
+
+
+def run_benchmark_timed(benchmark_model):
+    """
+    Run a benchmark and record its wall time and exit status.
+
+    Parameters:
+    - benchmark_model: The model object to run. Models that aren't benchmarks run a single stage.
+
+    Returns:
+    - A dictionary with the benchmark name, model folder, log file, wall time and exit status.
+    """
+    start_time = time.perf_counter()
+    error = None
+    try:
+        if benchmark_model.benchmark:
+            benchmark_model.run_benchmark()
+        else:
+            benchmark_model.run_stage()
+    except Exception as e:
+        error = str(e)
+    wall_time = time.perf_counter() - start_time
+
+    return {
+        "benchmark_name": benchmark_model.benchmark_name,
+        "model_folder": benchmark_model.model_folder,
+        "log_file": benchmark_model.log_file,
+        "wall_time": wall_time,
+        "return_code": benchmark_model.return_code,
+        "error": error,
+    }
+
+
+def run_benchmarks_parallel(benchmark_models, scratch_dir=None, max_workers=None):
+    """
+    Run several benchmarks at the same time, each in an isolated copy of its .A3D folder.
+
+    Parameters:
+    - benchmark_models: A list of model objects created with benchmark=True.
+    - scratch_dir: Directory to copy the models to. A temporary directory is created if None.
+    - max_workers: Number of benchmarks that run at the same time. Defaults to the number of cores.
+
+    Returns:
+    - A list with a result dictionary for each benchmark (see run_benchmark_timed), in the input order.
+    """
+    if scratch_dir is None:
+        scratch_dir = tempfile.mkdtemp(prefix="anura3d_benchmarks_")
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    # Copy all of the models before starting so a failed copy doesn't leave runs half started
+    scratch_models = [copy_model_to_scratch(benchmark_model, scratch_dir) for benchmark_model in benchmark_models]
+
+    # The kernel runs in a subprocess so threads are enough to run the benchmarks concurrently
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(run_benchmark_timed, scratch_models))
+
+    return results
@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import tempfile
+import datetime
+import numpy as np
+
+from lib.benchmark_info.run_benchmarks_info import benchmark_info_dict
+from lib.data_classes.CPS import cps_file
+from lib.general_functions.benchmark_runner import copy_model_to_scratch
+from lib.general_functions.read_mpm_data import read_par_data
+from lib.general_functions.stage_manifest import hash_file
+
+# Default file that the benchmark history is stored in
+BENCHMARK_HISTORY_FILE = "benchmark_history.json"
+
+# PAR columns that count time or steps, they are not results and are not compared to the baseline
+BOOKKEEPING_COLUMNS = ("Time", "Step", "LoadStep", "TimeStep", "ID")
+
+
+def is_output_quantity(name):
+    # Purpose: Check if an output (e.g. "final_Uy") is a physical result and not a time or step counter
+    return name.removeprefix("final_") not in BOOKKEEPING_COLUMNS
+
+
+def load_history(history_file):
+    # Purpose: Load the baseline and the earlier runs of the benchmark suite, empty if the file doesn't exist
+    try:
+        with open(history_file, "r") as file:
+            history = json.load(file)
+    except (OSError, ValueError):
+        return {"baseline": {}, "runs": []}
+
+    history.setdefault("baseline", {})
+    history.setdefault("runs", [])
+    return history
+
+
+def save_history(history_file, history):
+    # Purpose: Write the history with a temporary file and a rename so a crash never leaves it half written
+    temp_path = f"{history_file}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(history, file, indent=4)
+    os.replace(temp_path, history_file)
+
+
+def count_loadsteps(benchmark_model):
+    # Purpose: Get the total number of load steps of the stages of a benchmark from their CPS files
+    total = 0
+    for stage in range(1, benchmark_model.num_stages + 1):
+        stage_cps = f"{benchmark_model.model_path}.CPS_{stage:03d}"
+        if not os.path.exists(stage_cps):
+            return None
+        total += cps_file(stage_cps).get("NUMBER_OF_LOADSTEPS", int)
+    return total
+
+
+def summarize_par_outputs(benchmark_model):
+    """
+    Get key output quantities of a finished benchmark from its PAR files.
+
+    Parameters:
+    - benchmark_model: The model object that has been run.
+
+    Returns:
+    - A dictionary with the mean over the PAR files of each variable at the end of the run, e.g. "final_Uy".
+    """
+    par_dataframes = read_par_data(benchmark_model.model_folder, use_cache=False)
+    if not par_dataframes:
+        return {}
+
+    # The last row of each PAR file is the state at the end of the run
+    final_rows = [df.iloc[-1] for df in par_dataframes.values() if len(df)]
+    quantities = {}
+    for column in final_rows[0].index:
+        if not is_output_quantity(column):
+            continue
+        values = np.array([row[column] for row in final_rows if column in row.index], dtype=float)
+        quantities[f"final_{column}"] = float(np.mean(values))
+    return quantities
+
+
+def run_benchmark_case(benchmark_model, collect_results=summarize_par_outputs):
+    """
+    Run all of the stages of a benchmark and measure its cost.
+
+    Parameters:
+    - benchmark_model: The model object to run, created with benchmark=True.
+    - collect_results: Function that takes the finished model and returns a dict of output quantities.
+
+    Returns:
+    - A dictionary with the wall time, load steps per second, peak RSS and CPU time of the kernel,
+      the exit status, the output quantities and an error message (None if the run succeeded).
+    """
+    error = None
+    start_time = time.perf_counter()
+    try:
+        # Rerun every stage, skipped stages would make the timing meaningless
+        benchmark_model.run_benchmark(resume=False)
+    except Exception as e:
+        error = str(e)
+    wall_time = time.perf_counter() - start_time
+
+    usage = benchmark_model.resource_usage
+    peak_rss = max((stage_usage["peak_rss"] for stage_usage in usage if "peak_rss" in stage_usage), default=None)
+    cpu_time = sum(stage_usage.get("user_time", 0) + stage_usage.get("system_time", 0) for stage_usage in usage)
+
+    loadsteps = count_loadsteps(benchmark_model)
+    outputs = {}
+    if error is None and collect_results is not None:
+        try:
+            outputs = collect_results(benchmark_model)
+        except Exception as e:
+            error = f"Collecting results failed: {e}"
+
+    return {
+        "wall_time": wall_time,
+        "loadsteps": loadsteps,
+        "loadsteps_per_second": loadsteps / wall_time if loadsteps and wall_time > 0 else None,
+        "peak_rss": peak_rss,
+        "cpu_time": cpu_time if peak_rss is not None else None,
+        "return_code": benchmark_model.return_code,
+        "outputs": outputs,
+        "error": error,
+    }
+
+
+def find_regressions(record, baseline, threshold=0.1, output_tolerance=1e-6):
+    """
+    Compare the record of a benchmark run to its baseline.
+
+    Parameters:
+    - record: The record of the run (see run_benchmark_case).
+    - baseline: The record of the baseline run.
+    - threshold: Relative change of the wall time, load steps per second and peak RSS that is a regression.
+    - output_tolerance: Relative change of an output quantity that is a regression.
+
+    Returns:
+    - A list of messages, one for each regression (empty if there are none).
+    """
+    if record["error"] is not None:
+        return [f"Run failed: {record['error']}"]
+
+    regressions = []
+
+    # Higher is worse
+    for quantity in ("wall_time", "peak_rss"):
+        if record.get(quantity) is not None and baseline.get(quantity):
+            change = record[quantity] / baseline[quantity] - 1
+            if change > threshold:
+                regressions.append(f"{quantity} increased by {change:.1%} ({baseline[quantity]:.4g} -> {record[quantity]:.4g})")
+
+    # Lower is worse
+    quantity = "loadsteps_per_second"
+    if record.get(quantity) is not None and baseline.get(quantity):
+        change = 1 - record[quantity] / baseline[quantity]
+        if change > threshold:
+            regressions.append(f"{quantity} decreased by {change:.1%} ({baseline[quantity]:.4g} -> {record[quantity]:.4g})")
+
+    # The results should not drift, baselines written before BOOKKEEPING_COLUMNS existed also hold the times
+    for name, baseline_value in baseline.get("outputs", {}).items():
+        if not is_output_quantity(name):
+            continue
+        value = record["outputs"].get(name)
+        if value is None:
+            regressions.append(f"Output '{name}' is missing")
+        elif abs(value - baseline_value) > output_tolerance * max(abs(baseline_value), 1e-30):
+            regressions.append(f"Output '{name}' changed ({baseline_value:.6g} -> {value:.6g})")
+
+    return regressions
+
+
+def run_benchmark_suite(benchmark_models, history_file=BENCHMARK_HISTORY_FILE, scratch_dir=None, threshold=0.1,
+                        output_tolerance=1e-6, update_baseline=False, collect_results=summarize_par_outputs):
+    """
+    Run each benchmark, record the results in the history and flag regressions against the stored baseline.
+
+    The benchmarks run one after the other in a clean copy of their .A3D folder so the timings don't affect each other.
+
+    Parameters:
+    - benchmark_models: A list of model objects created with benchmark=True, one for each benchmark in benchmark_info_dict.
+    - history_file: JSON file with the baseline and the earlier runs.
+    - scratch_dir: Directory to copy the models to. A temporary directory is created if None.
+    - threshold: Relative change of the wall time, load steps per second and peak RSS that is a regression.
+    - output_tolerance: Relative change of an output quantity that is a regression.
+    - update_baseline: Store the records of this run as the new baseline. Benchmarks without a baseline
+                       always get one from their first successful run.
+    - collect_results: Function that takes a finished model and returns a dict of output quantities.
+
+    Returns:
+    - A dictionary with the records and the regressions of each benchmark, and the benchmarks of
+      benchmark_info_dict that were not run.
+    """
+    if scratch_dir is None:
+        scratch_dir = tempfile.mkdtemp(prefix="anura3d_benchmark_suite_")
+
+    history = load_history(history_file)
+    records = {}
+    regressions = {}
+
+    for benchmark_model in benchmark_models:
+        scratch_model = copy_model_to_scratch(benchmark_model, scratch_dir)
+
+        # Start from the input files only
+        scratch_model.reset_to_inputs()
+
+        print(f"Running benchmark {benchmark_model.benchmark_name}")
+        record = run_benchmark_case(scratch_model, collect_results)
+        record["exe_fingerprint"] = hash_file(benchmark_model.exe_path)
+        records[benchmark_model.benchmark_name] = record
+
+        baseline = history["baseline"].get(benchmark_model.benchmark_name)
+        if baseline is None or update_baseline:
+            regressions[benchmark_model.benchmark_name] = [] if record["error"] is None else [f"Run failed: {record['error']}"]
+            if record["error"] is None:
+                history["baseline"][benchmark_model.benchmark_name] = record
+        else:
+            regressions[benchmark_model.benchmark_name] = find_regressions(record, baseline, threshold, output_tolerance)
+
+        for message in regressions[benchmark_model.benchmark_name]:
+            print(f"Regression in {benchmark_model.benchmark_name}: {message}")
+
+    history["runs"].append({
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "records": records,
+        "regressions": regressions,
+    })
+    save_history(history_file, history)
+
+    run_names = {benchmark_model.benchmark_name for benchmark_model in benchmark_models}
+    return {
+        "records": records,
+        "regressions": regressions,
+        "missing": [name for name in benchmark_info_dict if name not in run_names],
+    }
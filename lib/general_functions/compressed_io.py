@@ -0,0 +1,131 @@
+import os
+import io
+import gzip
+import glob
+import fnmatch
+import zipfile
+
+# zstd is optional, gzip and zip are always available
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# The first bytes of compressed files, compression is detected from the content and not from the extension
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def split_archive_path(path):
+    """
+    Split a path that points inside of a zip archive into the archive and the member.
+
+    Parameters:
+    - path: A path like "runs.zip/Foo.A3D/Foo.PAR_001", or a normal path.
+
+    Returns:
+    - A (archive path, member name) tuple, or (None, path) if the path isn't inside of a zip archive.
+    """
+    if os.path.exists(path):
+        return None, path
+
+    head = os.path.normpath(path)
+    parts = []
+    while True:
+        head, tail = os.path.split(head)
+        if not tail:
+            return None, path
+        parts.insert(0, tail)
+        if os.path.isfile(head):
+            if zipfile.is_zipfile(head):
+                return head, "/".join(parts)
+            return None, path
+
+
+def result_path_exists(path):
+    # Purpose: Check if a file or folder exists on disk or inside of a zip archive
+    archive, member = split_archive_path(path)
+    if archive is None:
+        return os.path.exists(path)
+
+    with zipfile.ZipFile(archive) as zip_file:
+        names = zip_file.namelist()
+    return member in names or any(name.startswith(member.rstrip("/") + "/") for name in names)
+
+
+def list_result_files(directory, pattern):
+    """
+    Find the files in a folder that match a pattern, the folder can be inside of a zip archive.
+
+    Parameters:
+    - directory: The folder to search, e.g. "Foo.A3D" or "runs.zip/Foo.A3D".
+    - pattern: A file name pattern, e.g. "Foo.PAR_*".
+
+    Returns:
+    - A list of paths that can be opened with open_result_file.
+    """
+    archive, member = split_archive_path(directory)
+    if archive is None:
+        return glob.glob(f"{directory}/{pattern}")
+
+    prefix = member.rstrip("/") + "/"
+    with zipfile.ZipFile(archive) as zip_file:
+        names = zip_file.namelist()
+
+    matching_files = []
+    for name in names:
+        file_name = name[len(prefix):]
+        if name.startswith(prefix) and "/" not in file_name and fnmatch.fnmatch(file_name, pattern):
+            matching_files.append(f"{directory}/{file_name}")
+    return matching_files
+
+
+def _decompress(stream):
+    # Purpose: Wrap a binary stream in a streaming decompressor if its content is compressed
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream)
+    magic = stream.peek(4)[:4]
+
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if magic.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            stream.close()
+            raise ImportError("Reading zstd files needs the zstandard package (pip install zstandard)")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(stream, closefd=True))
+    return stream
+
+
+def open_result_file(path):
+    """
+    Open a result file (e.g. a PAR or OUT file) for reading, decompressing it while it is read.
+
+    Files compressed with gzip or zstd and files inside of a zip archive (see split_archive_path) are read
+    in chunks, so they are never decompressed to disk or into memory as a whole.
+
+    Parameters:
+    - path: Path to the file.
+
+    Returns:
+    - A binary file object, use it with a with statement (or pass it to pandas.read_csv).
+    """
+    archive, member = split_archive_path(path)
+    if archive is None:
+        stream = open(path, "rb")
+    else:
+        with zipfile.ZipFile(archive) as zip_file:
+            # The member stays readable after the archive is closed
+            stream = zip_file.open(member)
+
+    # gzip.GzipFile doesn't close the stream it reads from, so close it together with the decompressor
+    decompressed = _decompress(stream)
+    if isinstance(decompressed, gzip.GzipFile):
+        decompressed.myfileobj = stream
+    return decompressed
+
+
+def iter_result_lines(path):
+    # Purpose: Yield the lines of a (compressed or archived) text file one at a time
+    with open_result_file(path) as stream:
+        for line in io.TextIOWrapper(stream, errors="replace"):
+            yield line
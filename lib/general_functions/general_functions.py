@@ -1,17 +1,58 @@
 import subprocess
 import os
-from IPython.display import display, update_display, HTML
+import sys
+
+from lib.general_functions.retention import apply_retention_policy, keep_extensions_rules
    
-def run_executable(executable_path, argument):
+def wait_for_process(process, usage=None):
+    # Purpose: Wait for a process to finish and return its exit status
+    # usage is an optional dictionary that receives the peak RSS (bytes) and CPU time (s) of the process
+    try:
+        if not hasattr(os, "wait4"):
+            # Windows has no resource usage of a single child process
+            return process.wait()
+
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    except BaseException:
+        # Don't leave the kernel running if waiting is interrupted (e.g. by Ctrl+C)
+        process.kill()
+        process.wait()
+        raise
+
+    if usage is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        usage["peak_rss"] = rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        usage["user_time"] = rusage.ru_utime
+        usage["system_time"] = rusage.ru_stime
+    return process.returncode
+
+def run_executable(executable_path, argument, log_file=None, usage=None, env=None):
+    # Purpose: Run the executable and return its exit status, optionally writing stdout and stderr to a log file
+    # usage is an optional dictionary that receives the resource usage of the executable (see wait_for_process)
+    # env is an optional dictionary of environment variables that are set for the executable (e.g. OMP_NUM_THREADS)
+    if env is not None:
+        env = {**os.environ, **env}
     try:
         # Run the executable with the specified argument
-        subprocess.run([executable_path, argument], check=True)
+        if log_file is None:
+            return_code = wait_for_process(subprocess.Popen([executable_path, argument], env=env), usage)
+        else:
+            with open(log_file, 'a') as log:
+                return_code = wait_for_process(subprocess.Popen([executable_path, argument], stdout=log, stderr=subprocess.STDOUT, env=env), usage)
+        if return_code != 0:
+            raise subprocess.CalledProcessError(return_code, [executable_path, argument])
+        return 0
     except subprocess.CalledProcessError as e:
         print(f"Error: {e}")
+        return e.returncode
     except FileNotFoundError:
         print("Error: Executable not found.")
+        # The exit status of a shell for a command that isn't found
+        return 127
     except Exception as e:
         print(f"An error occurred: {e}")
+        return 1
     
 def get_highest_file(directory, base_extension):
     # Get a list of files in the directory
@@ -59,18 +100,12 @@ def overwrite_line_after_string(filename, target_string, new_value):
     #TODO: Add
 
 def delete_files_with_extensions(directory, keep_extensions):
+    # Purpose: Delete the files in a directory that don't end with one of keep_extensions (directories like the PAR cache are skipped)
     try:
-        # List all files in the directory
-        files = os.listdir(directory)
-        
-        # Filter out the files with extensions you want to keep
-        files_to_keep = [file for file in files if any(file.endswith(ext) for ext in keep_extensions)]
-        
-        # Delete the files that don't have the specified extensions
-        for file in files:
-            if file not in files_to_keep:
-                os.remove(os.path.join(directory, file))
-        
+        report = apply_retention_policy(directory, keep_extensions_rules(keep_extensions))
+        for error in report["errors"]:
+            print("An error occurred:", error)
+
         print("Files deleted successfully.")
     except Exception as e:
         print("An error occurred:", e)
\ No newline at end of file
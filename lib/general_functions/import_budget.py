@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import subprocess
+
+# Modules that runner processes import and the most time (s) an import may take in a fresh interpreter
+CORE_IMPORT_BUDGETS = {
+    "lib.data_classes.CPS": 0.1,
+    "lib.data_classes.GOM": 0.3,
+    "lib.data_classes.GiD": 0.3,
+    "lib.data_classes.Model": 0.4,
+}
+
+# Packages that the core must not import, they are loaded on first use by the analysis and plotting functions
+HEAVY_MODULES = ("pandas", "matplotlib", "IPython", "scipy")
+
+# The folder that contains lib, so the measurements work from any working directory
+REPOSITORY_FOLDER = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_MEASURE_SCRIPT = """
+import sys, json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"time": elapsed, "heavy": sorted(name for name in {heavy!r} if name in sys.modules)}}))
+"""
+
+
+def measure_import(module, repeats=3):
+    """
+    Measure the time to import a module in a fresh interpreter, like a short-lived runner process.
+
+    Parameters:
+    - module: The module name, e.g. "lib.data_classes.Model".
+    - repeats: Number of interpreters that are started, the fastest import is reported (the others include disk cache misses).
+
+    Returns:
+    - A dictionary with the import "time" in seconds and the "heavy" modules (see HEAVY_MODULES) that were loaded.
+    """
+    results = []
+    for _ in range(repeats):
+        completed = subprocess.run([sys.executable, "-c", _MEASURE_SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+                                   cwd=REPOSITORY_FOLDER, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise ImportError(f"Importing '{module}' failed:\n{completed.stderr}")
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return min(results, key=lambda result: result["time"])
+
+
+def check_import_budget(budgets=None, repeats=3):
+    """
+    Check that the core modules import within their time budget and without heavy dependencies.
+
+    Parameters:
+    - budgets: A dictionary of module name to the allowed import time in seconds, defaults to CORE_IMPORT_BUDGETS.
+    - repeats: Number of measurements per module.
+
+    Returns:
+    - A (results, violations) tuple: the measurement of each module and a list of messages for the broken budgets.
+    """
+    budgets = CORE_IMPORT_BUDGETS if budgets is None else budgets
+    results = {}
+    violations = []
+    for module, budget in budgets.items():
+        result = measure_import(module, repeats)
+        results[module] = result
+        if result["time"] > budget:
+            violations.append(f"{module}: import took {result['time']:.3f} s, the budget is {budget:.3f} s")
+        if result["heavy"]:
+            violations.append(f"{module}: imports {', '.join(result['heavy'])} at start up")
+    return results, violations
+
+
+if __name__ == "__main__":
+    # Usage: python -m lib.general_functions.import_budget, exits with 1 if a budget is broken
+    results, violations = check_import_budget()
+    for module, result in results.items():
+        print(f"{module}: {result['time']:.3f} s")
+    for violation in violations:
+        print(f"Error: {violation}")
+    sys.exit(1 if violations else 0)
@@ -0,0 +1,175 @@
+import os
+import time
+import heapq
+import itertools
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+def get_available_cpus():
+    # Purpose: Get the cores this process may run on (the affinity mask on Linux, all cores elsewhere)
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def openmp_environment(cpus):
+    """
+    Get the OpenMP environment variables that run a kernel with a thread on each of the given cores.
+
+    Parameters:
+    - cpus: The core numbers of the job.
+
+    Returns:
+    - A dictionary with OMP_NUM_THREADS, OMP_PLACES (one place per core) and OMP_PROC_BIND.
+    """
+    return {
+        "OMP_NUM_THREADS": str(len(cpus)),
+        "OMP_PLACES": ",".join(f"{{{cpu}}}" for cpu in cpus),
+        "OMP_PROC_BIND": "close",
+    }
+
+
+def _choose_cpus(free_cpus, threads):
+    # Purpose: Pick the cores of a job, a run of neighbouring cores if there is one so the threads share caches
+    free_cpus = sorted(free_cpus)
+    for start in range(len(free_cpus) - threads + 1):
+        block = free_cpus[start:start + threads]
+        if block[-1] - block[0] == threads - 1:
+            return block
+    return free_cpus[:threads]
+
+
+class kernel_scheduler:
+    # Purpose: Run the stages of several models at the same time without oversubscribing the cores
+    #
+    # Each job declares the number of OpenMP threads of its kernel. A job starts when that many cores are free
+    # and gets its own set of cores: OMP_NUM_THREADS and OMP_PLACES are set for the kernel and, on Linux, the
+    # kernel is pinned to the cores. Waiting jobs start in order of priority. A smaller job may start ahead of
+    # a job that doesn't fit yet (backfilling), but only max_bypass times, so large jobs can't starve.
+
+    def __init__(self, cpus=None, pin=True, max_bypass=3):
+        """
+        Parameters:
+        - cpus: The cores to run the jobs on, defaults to all cores this process may use.
+        - pin: Pin each kernel to its cores (Linux only, the OpenMP variables are always set).
+        - max_bypass: Number of times a waiting job can be passed by jobs of lower priority.
+        """
+        self.cpus = sorted(cpus) if cpus is not None else get_available_cpus()
+        self.pin = pin and hasattr(os, "sched_setaffinity")
+        self.max_bypass = max_bypass
+        self.pending = []
+        self.counter = itertools.count()
+
+    def __str__(self):
+        return f"Kernel Scheduler: {len(self.cpus)} cores \nWaiting jobs: {len(self.pending)}"
+
+    def submit(self, job_model, threads=1, priority=0, action="run_stage", name=None):
+        """
+        Add a job to the queue.
+
+        Parameters:
+        - job_model: The model object to run.
+        - threads: Number of OpenMP threads (and cores) of the kernel, limited to the cores of the scheduler.
+        - priority: Jobs with a higher priority start first.
+        - action: The model method that is called, e.g. "run_stage" or "run_benchmark".
+        - name: Name of the job in the results, defaults to the model name.
+
+        Returns:
+        - The job dictionary.
+        """
+        if not callable(getattr(job_model, action, None)):
+            raise ValueError(f"The model has no method '{action}'")
+        order = next(self.counter)
+        job = {
+            "name": name or job_model.model_name,
+            "model": job_model,
+            "threads": max(1, min(int(threads), len(self.cpus))),
+            "priority": priority,
+            "action": action,
+            "order": order,
+            "bypassed": 0,
+        }
+        heapq.heappush(self.pending, (-priority, order, job))
+        return job
+
+    def _run_job(self, job, cpus):
+        # Purpose: Run a job on its cores, this runs on a worker thread
+        job_model = job["model"]
+        previous_environment = job_model.environment
+        job_model.environment = {**(previous_environment or {}), **openmp_environment(cpus)}
+
+        result = {"name": job["name"], "cpus": cpus, "threads": len(cpus), "priority": job["priority"],
+                  "start_time": time.time(), "error": None}
+        start = time.perf_counter()
+
+        # The kernel inherits the affinity of the thread that starts it
+        previous_affinity = os.sched_getaffinity(0) if self.pin else None
+        try:
+            if self.pin:
+                os.sched_setaffinity(0, cpus)
+            getattr(job_model, job["action"])()
+        except Exception as e:
+            result["error"] = str(e)
+        finally:
+            if self.pin:
+                os.sched_setaffinity(0, previous_affinity)
+            job_model.environment = previous_environment
+
+        result["wall_time"] = time.perf_counter() - start
+        result["return_code"] = job_model.return_code
+        result["usage"] = job_model.resource_usage[-1] if job_model.resource_usage else None
+        return result
+
+    def _next_jobs(self, free_cpus):
+        # Purpose: Take the waiting jobs that can start on the free cores, in order of priority
+        started = []
+        waiting = []
+        while self.pending:
+            entry = heapq.heappop(self.pending)
+            job = entry[2]
+
+            # A job that was passed too often reserves the cores that become free for itself
+            reserved = any(waiting_job["bypassed"] >= self.max_bypass for _, _, waiting_job in waiting)
+            if not reserved and job["threads"] <= len(free_cpus):
+                cpus = _choose_cpus(free_cpus, job["threads"])
+                free_cpus.difference_update(cpus)
+                started.append((job, cpus))
+                for _, _, waiting_job in waiting:
+                    waiting_job["bypassed"] += 1
+            else:
+                waiting.append(entry)
+
+        for entry in waiting:
+            heapq.heappush(self.pending, entry)
+        return started
+
+    def run(self, callback=None):
+        """
+        Run all of the jobs in the queue.
+
+        Parameters:
+        - callback: Optional function that is called with the result of each job when it finishes.
+
+        Returns:
+        - A list with a result dictionary per job in the order they were submitted, with the "name", the "cpus",
+          the number of "threads", the "priority", the "start_time", the "wall_time", the "return_code", the
+          resource "usage" of the last stage and the "error" if the job raised one.
+        """
+        free_cpus = set(self.cpus)
+        results = {}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=len(self.cpus)) as executor:
+            while self.pending or running:
+                for job, cpus in self._next_jobs(free_cpus):
+                    running[executor.submit(self._run_job, job, cpus)] = (job, cpus)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, cpus = running.pop(future)
+                    free_cpus.update(cpus)
+                    results[job["order"]] = future.result()
+                    if callback is not None:
+                        callback(results[job["order"]])
+
+        return [results[order] for order in sorted(results)]
@@ -0,0 +1,186 @@
+import os
+import mmap
+import numpy as np
+import pandas as pd
+
+from lib.general_functions.par_cache import get_par_cache_dir
+
+# Version of the step index and binary copy, a change invalidates the files that were written before
+MP_INDEX_VERSION = 1
+
+
+def read_rows(file_path, start, end, num_rows, num_columns):
+    # Purpose: Parse the rows between two byte offsets of a result file (e.g. a step of the step index)
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        text = file.read(end - start).decode()
+    return np.fromstring(text, dtype=float, sep=" ").reshape(num_rows, num_columns)
+
+
+class mp_result_reader:
+    # Purpose: Random access to the steps of a large whitespace delimited material point result file
+    #
+    # The file starts with a header line with the column names, followed by one row per material point
+    # and step. The rows of a step are contiguous and share the value of the step column (e.g. "Time").
+    # The first use builds an index with the byte offset of every step, after which a step is read without
+    # parsing the steps before it. After to_binary() the steps are served as zero-copy views of a .npy file.
+
+    def __init__(self, file_path, step_column="Time", chunksize=1000000):
+        self.file_path = file_path
+        self.step_column = step_column
+        self.chunksize = chunksize
+        self.cache_dir = get_par_cache_dir(file_path)
+
+        with open(file_path, "r") as file:
+            self.columns = file.readline().split()
+        if step_column not in self.columns:
+            raise KeyError(f"The step column '{step_column}' is not in the file '{file_path}'")
+
+        self._load_or_build_index()
+
+    def __str__(self):
+        return f"MP Result File: {self.file_path} \nSteps: {self.num_steps} \nColumns: {self.columns}"
+
+    def _source_key(self):
+        stat = os.stat(self.file_path)
+        return np.array([MP_INDEX_VERSION, stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, f"step_index_{self.step_column}.npz")
+
+    def _binary_path(self):
+        return os.path.join(self.cache_dir, "values.npy")
+
+    def _load_or_build_index(self):
+        # Purpose: Load the step index if it belongs to the current file, otherwise build and save it
+        try:
+            with np.load(self._index_path()) as index:
+                if np.array_equal(index["source"], self._source_key()):
+                    self.step_values = index["step_values"]
+                    self.step_rows = index["step_rows"]
+                    self.step_offsets = index["step_offsets"]
+                    self.has_binary = "binary_source" in index and np.array_equal(index["binary_source"], self._source_key())
+                    return
+        except (OSError, KeyError, ValueError):
+            pass
+
+        self.build_index()
+
+    def build_index(self):
+        # Purpose: Find the first row and the byte offset of each step in two streaming passes over the file
+
+        # Pass 1: only parse the step column to find the rows where a new step starts
+        step_values = []
+        step_rows = []
+        previous_value = None
+        row = 0
+        reader = pd.read_csv(self.file_path, sep=r"\s+", usecols=[self.step_column], chunksize=self.chunksize)
+        for chunk in reader:
+            values = chunk[self.step_column].to_numpy()
+            starts = np.flatnonzero(np.concatenate(([values[0] != previous_value], values[1:] != values[:-1])))
+            step_values.extend(values[starts].tolist())
+            step_rows.extend((starts + row).tolist())
+            previous_value = values[-1]
+            row += len(values)
+        reader.close()
+        num_rows = row
+
+        # Pass 2: count new lines to convert the row numbers to byte offsets (row r starts after new line r)
+        wanted_lines = np.array(step_rows + [num_rows], dtype=np.int64)
+        offsets = np.zeros(len(wanted_lines), dtype=np.int64)
+        file_size = os.path.getsize(self.file_path)
+        lines_seen = 0
+        block_size = 64 * 1024 * 1024
+        with open(self.file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for block_start in range(0, file_size, block_size):
+                block = np.frombuffer(data, dtype=np.uint8, count=min(block_size, file_size - block_start), offset=block_start)
+                newlines = np.flatnonzero(block == ord("\n")) + block_start + 1
+                del block
+
+                # The lines in this block that start one of the steps
+                in_block = (wanted_lines >= lines_seen) & (wanted_lines < lines_seen + len(newlines))
+                offsets[in_block] = newlines[wanted_lines[in_block] - lines_seen]
+                lines_seen += len(newlines)
+
+        # The end of the last step is the end of the file if it has no trailing new line
+        offsets[wanted_lines >= lines_seen] = file_size
+
+        self.step_values = np.array(step_values)
+        self.step_rows = np.array(step_rows + [num_rows], dtype=np.int64)
+        self.step_offsets = offsets
+        self.has_binary = False
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.savez(self._index_path(), source=self._source_key(), step_values=self.step_values,
+                     step_rows=self.step_rows, step_offsets=self.step_offsets)
+        except OSError:
+            # The index is still used in memory if the folder is read-only
+            pass
+
+    @property
+    def num_steps(self):
+        return len(self.step_values)
+
+    def find_step(self, step_value):
+        # Purpose: Get the number of the step with the value of the step column closest to step_value
+        return int(np.argmin(np.abs(self.step_values - step_value)))
+
+    def column_indices(self, columns):
+        # Purpose: Get the positions of columns in the rows of the file (a list of names, a slice or None for all columns)
+        if columns is None:
+            return slice(None)
+        if isinstance(columns, slice):
+            return columns
+        missing = [column for column in columns if column not in self.columns]
+        if missing:
+            raise KeyError(f"Missing variables in the result file: {', '.join(missing)}")
+        return [self.columns.index(column) for column in columns]
+
+    def read_step_array(self, step, columns=None):
+        """
+        Read the values of one step.
+
+        Parameters:
+        - step: The step number (0 to num_steps - 1), negative numbers count from the end.
+        - columns: A list of column names, a slice of column positions or None for all columns.
+
+        Returns:
+        - An array with a row per material point. After to_binary() this is a read-only view of the
+          memory-mapped binary file (no copy is made for a slice of columns).
+        """
+        step = range(self.num_steps)[step]
+        column_indices = self.column_indices(columns)
+        start_row, end_row = self.step_rows[step], self.step_rows[step + 1]
+
+        if self.has_binary:
+            values = np.load(self._binary_path(), mmap_mode="r")
+            return values[start_row:end_row, column_indices]
+
+        # Parse only the bytes of this step
+        values = read_rows(self.file_path, self.step_offsets[step], self.step_offsets[step + 1],
+                           end_row - start_row, len(self.columns))
+        return values[:, column_indices]
+
+    def read_step(self, step, columns=None):
+        # Purpose: Read the values of one step into a DataFrame (see read_step_array)
+        values = self.read_step_array(step, columns)
+        names = self.columns if columns is None else (self.columns[columns] if isinstance(columns, slice) else list(columns))
+        return pd.DataFrame(np.asarray(values), columns=names)
+
+    def to_binary(self):
+        # Purpose: Convert the file once into a memory-mappable .npy file, step by step with bounded memory
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = self._binary_path() + ".tmp.npy"
+        values = np.lib.format.open_memmap(temp_path, mode="w+", dtype=float,
+                                           shape=(int(self.step_rows[-1]), len(self.columns)))
+        for step in range(self.num_steps):
+            values[self.step_rows[step]:self.step_rows[step + 1]] = self.read_step_array(step)
+        values.flush()
+        del values
+        os.replace(temp_path, self._binary_path())
+
+        # Record which version of the file the binary copy belongs to
+        np.savez(self._index_path(), source=self._source_key(), step_values=self.step_values,
+                 step_rows=self.step_rows, step_offsets=self.step_offsets, binary_source=self._source_key())
+        self.has_binary = True
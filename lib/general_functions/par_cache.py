@@ -0,0 +1,194 @@
+import os
+import json
+import uuid
+import numpy as np
+import pandas as pd
+
+from lib.general_functions.compressed_io import open_result_file
+
+# Name of the directory, next to the PAR files, that holds the binary copies
+PAR_CACHE_DIR = ".par_cache"
+PAR_CACHE_VERSION = 2
+
+
+def get_par_cache_dir(file_path):
+    # Purpose: Get the cache directory of a PAR file
+    directory, file_name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, PAR_CACHE_DIR, file_name)
+
+
+def _source_key(file_path):
+    # Purpose: Identify the version of a PAR file, the solver rewriting the file changes the key
+    stat = os.stat(file_path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _column_file(cache_dir, i, generation=None):
+    # Purpose: Get the file of a column, each write of the cache uses new files (a generation) so files are never overwritten
+    # Caches of version 1 have no generation
+    suffix = f".{generation}" if generation else ""
+    return os.path.join(cache_dir, f"col_{i:03d}{suffix}.npy")
+
+
+def _read_cache_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "meta.json"), "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _load_cache_meta(cache_dir, file_path):
+    # Purpose: Load the cache description, None if there is no valid cache for the current file
+    meta = _read_cache_meta(cache_dir)
+    if meta is None:
+        return None
+
+    if meta.get("version") != PAR_CACHE_VERSION or meta.get("source") != _source_key(file_path):
+        return None
+    return meta
+
+
+def write_par_cache(file_path, df, source_key=None):
+    """
+    Store the columns of a PAR DataFrame as one .npy file per column.
+
+    Parameters:
+    - file_path: The PAR file that the DataFrame was read from.
+    - df: The DataFrame with the content of the PAR file.
+    - source_key: The _source_key of the file taken before it was parsed. If the file changed since then
+      (e.g. the solver appended rows while it was parsed) nothing is written. Defaults to the current key.
+
+    Returns:
+    - True if the cache was written, False if it couldn't be (e.g. non-numeric columns, a read-only folder
+      or a file that changed while it was parsed).
+    """
+    if not all(np.issubdtype(dtype, np.number) for dtype in df.dtypes):
+        return False
+
+    try:
+        current_key = _source_key(file_path)
+    except OSError:
+        return False
+    if source_key is None:
+        source_key = current_key
+    elif source_key != current_key:
+        # The DataFrame holds an older version of the file, caching it under the new key would serve stale data
+        return False
+
+    cache_dir = get_par_cache_dir(file_path)
+    previous_meta = _read_cache_meta(cache_dir)
+    generation = uuid.uuid4().hex[:12]
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Columns are stored by position so the file names don't depend on the column names. The files of the
+        # previous write may be memory-mapped by readers, so the columns go to new files and are never overwritten
+        for i, column in enumerate(df.columns):
+            np.save(_column_file(cache_dir, i, generation), df[column].to_numpy())
+
+        # The meta file is written last and replaced atomically, so readers switch to the new columns at once
+        meta = {
+            "version": PAR_CACHE_VERSION,
+            "source": source_key,
+            "columns": [str(column) for column in df.columns],
+            "num_rows": len(df),
+            "generation": generation,
+        }
+        meta_file = os.path.join(cache_dir, "meta.json")
+        with open(f"{meta_file}.{generation}.tmp", "w") as file:
+            json.dump(meta, file)
+        os.replace(f"{meta_file}.{generation}.tmp", meta_file)
+    except OSError:
+        _remove_columns(cache_dir, len(df.columns), generation)
+        return False
+
+    # Readers that still map the old files keep their data, on Windows files that are mapped can't be removed and are left
+    if previous_meta is not None and isinstance(previous_meta.get("columns"), list):
+        _remove_columns(cache_dir, len(previous_meta["columns"]), previous_meta.get("generation"))
+
+    return True
+
+
+def _remove_columns(cache_dir, num_columns, generation):
+    # Purpose: Remove the column files of a generation, files that are in use or already gone are skipped
+    for i in range(num_columns):
+        try:
+            os.remove(_column_file(cache_dir, i, generation))
+        except OSError:
+            pass
+
+
+def load_par_cache(file_path, columns=None):
+    """
+    Load columns of a PAR file from the cache as read-only memory-mapped arrays.
+
+    Parameters:
+    - file_path: Path to the PAR file.
+    - columns: Optional list of the columns to load, all columns are loaded if None.
+
+    Returns:
+    - A dictionary of column name to array, or None if there is no up to date cache.
+      A KeyError is raised if a requested column isn't in the file.
+    """
+    cache_dir = get_par_cache_dir(file_path)
+    meta = _load_cache_meta(cache_dir, file_path)
+    if meta is None:
+        return None
+
+    names = meta["columns"] if columns is None else columns
+    missing = [name for name in names if name not in meta["columns"]]
+    if missing:
+        raise KeyError(f"Missing variables in the PAR file: {', '.join(missing)}")
+
+    try:
+        return {
+            name: np.load(_column_file(cache_dir, meta["columns"].index(name), meta["generation"]), mmap_mode="r")
+            for name in names
+        }
+    except (OSError, ValueError):
+        # Treat a damaged cache as missing so the text file is read instead
+        return None
+
+
+def read_par_file(file_path, columns=None, use_cache=True):
+    """
+    Read a PAR file into a DataFrame, using the binary cache when it is up to date.
+
+    The first read parses the text file and stores each column as a .npy file in the cache.
+    Later reads load only the requested columns from the cache, as long as the modification
+    time and size of the PAR file are unchanged.
+
+    Parameters:
+    - file_path: Path to the PAR file.
+    - columns: Optional list of the columns to read, all columns are read if None.
+    - use_cache: If False the text file is always parsed and the cache isn't touched.
+                 Files inside of a zip archive are never cached.
+
+    Returns:
+    - A DataFrame with the requested columns.
+    """
+    # Compressed files are cached as well, the cache is stored next to the compressed file
+    use_cache = use_cache and os.path.isfile(file_path)
+    if use_cache:
+        data = load_par_cache(file_path, columns)
+        if data is not None:
+            return pd.DataFrame(data)
+
+        # The version of the file is taken before it is parsed, so rows appended during the parse aren't cached under it
+        source_key = _source_key(file_path)
+
+    # Compressed files and archive members are decompressed while they are parsed
+    with open_result_file(file_path) as stream:
+        df = pd.read_csv(stream, sep=r"\s+")
+
+    if use_cache:
+        write_par_cache(file_path, df, source_key)
+
+    if columns is not None:
+        missing = [name for name in columns if name not in df.columns]
+        if missing:
+            raise KeyError(f"Missing variables in the PAR file: {', '.join(missing)}")
+        df = df[list(columns)]
+
+    return df
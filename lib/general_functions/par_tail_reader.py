@@ -0,0 +1,148 @@
+import os
+import numpy as np
+import pandas as pd
+
+from lib.general_functions.read_mpm_data import find_par_files, get_par_key
+
+# Number of bytes before the read offset that are compared to find out if the file was rewritten (as for the .OUT file)
+SIGNATURE_BYTES = 64
+
+
+class par_tail_reader:
+    # Purpose: Read the rows that are appended to a PAR file while the kernel is running
+    #
+    # Each update() only reads the bytes after the last complete line that was read before and appends the new
+    # rows to a buffer that doubles in size when it is full, so following a run costs O(new rows) per update.
+    # A trailing line without a new line is still being written and is read by a later update.
+
+    def __init__(self, file_path, columns=None, initial_capacity=1024):
+        self.file_path = file_path
+        self.requested_columns = columns
+        self.initial_capacity = initial_capacity
+        self.reset()
+
+    def __str__(self):
+        return f"PAR Tail Reader: {self.file_path} \nRows: {self.num_rows} \nColumns: {self.columns}"
+
+    def reset(self):
+        # Purpose: Forget everything that was read, the next update starts at the beginning of the file
+        self.offset = 0
+        self.signature = b""
+        self.file_columns = None
+        self.columns = None
+        self.column_indices = None
+        self.num_rows = 0
+        self.buffer = None
+
+    def _read_header(self, line):
+        self.file_columns = line.split()
+        if self.requested_columns is None:
+            self.columns = list(self.file_columns)
+        else:
+            missing = [name for name in self.requested_columns if name not in self.file_columns]
+            if missing:
+                raise KeyError(f"Missing variables in the PAR file: {', '.join(missing)}")
+            self.columns = list(self.requested_columns)
+        self.column_indices = [self.file_columns.index(name) for name in self.columns]
+        self.buffer = np.empty((self.initial_capacity, len(self.columns)))
+
+    def _append(self, rows):
+        # Purpose: Add rows to the buffer, doubling its size if they don't fit
+        needed = self.num_rows + len(rows)
+        if needed > len(self.buffer):
+            capacity = max(needed, 2 * len(self.buffer))
+            buffer = np.empty((capacity, len(self.columns)))
+            buffer[:self.num_rows] = self.buffer[:self.num_rows]
+            self.buffer = buffer
+        self.buffer[self.num_rows:needed] = rows
+        self.num_rows = needed
+
+    def update(self):
+        """
+        Read the complete rows that were written since the last update.
+
+        Returns:
+        - The number of new rows. If the file was rewritten (it got shorter or the bytes before the offset changed)
+          it is read again from the start.
+        """
+        try:
+            with open(self.file_path, "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                rewritten = size < self.offset
+                if not rewritten and self.signature:
+                    file.seek(self.offset - len(self.signature))
+                    rewritten = file.read(len(self.signature)) != self.signature
+                if rewritten:
+                    self.reset()
+                if size == self.offset:
+                    return 0
+
+                file.seek(self.offset)
+                data = file.read(size - self.offset)
+        except OSError:
+            return 0
+
+        # Only use complete lines, the rest is read again by the next update
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return 0
+        text = data[:end].decode()
+        self.offset += end
+        self.signature = (self.signature + data[:end])[-SIGNATURE_BYTES:]
+
+        if self.file_columns is None:
+            header, _, text = text.partition("\n")
+            self._read_header(header)
+        if not text.strip():
+            return 0
+
+        values = np.fromstring(text, dtype=float, sep=" ")
+        if values.size % len(self.file_columns):
+            raise ValueError(f"The new rows of '{self.file_path}' don't have {len(self.file_columns)} values each")
+
+        rows = values.reshape(-1, len(self.file_columns))[:, self.column_indices]
+        self._append(rows)
+        return len(rows)
+
+    @property
+    def values(self):
+        # Purpose: Get the rows that have been read as a view of the buffer (valid until the next update)
+        if self.buffer is None:
+            return np.empty((0, 0))
+        return self.buffer[:self.num_rows]
+
+    def get(self, column):
+        # Purpose: Get the values of a column as a view of the buffer (valid until the next update)
+        return self.values[:, self.columns.index(column)]
+
+    def to_dataframe(self):
+        # Purpose: Copy the rows that have been read into a DataFrame
+        return pd.DataFrame(self.values.copy(), columns=self.columns)
+
+
+class par_directory_tailer:
+    # Purpose: Follow all of the PAR files of a .A3D folder during a run, including files that appear later
+
+    def __init__(self, directory, file_pattern_suffix="PAR_*", columns=None):
+        self.directory = directory
+        self.file_pattern_suffix = file_pattern_suffix
+        self.columns = columns
+        self.readers = {}
+
+    def update(self):
+        """
+        Read the new rows of every PAR file.
+
+        Returns:
+        - A dictionary with the number of new rows for each PAR file key.
+        """
+        for file in find_par_files(self.directory, self.file_pattern_suffix):
+            key = get_par_key(file)
+            if key not in self.readers:
+                self.readers[key] = par_tail_reader(file, self.columns)
+
+        return {key: reader.update() for key, reader in self.readers.items()}
+
+    def to_dataframes(self):
+        # Purpose: Get a DataFrame for each PAR file, in the same form as read_par_data
+        return {key: reader.to_dataframe() for key, reader in self.readers.items() if reader.num_rows}
@@ -0,0 +1,158 @@
+import os
+import shutil
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+from lib.data_classes.Model import model
+from lib.data_classes.CPS import cps_file
+from lib.data_classes.GOM import gom_file
+from lib.general_functions.benchmark_runner import relocate_path, run_benchmark_timed
+from lib.general_functions.retention import MODEL_INPUT_EXTENSIONS
+
+# Files of the base folder that are needed to run a variant (same as model.delete_folder_files)
+SWEEP_INPUT_EXTENSIONS = MODEL_INPUT_EXTENSIONS
+
+
+def parameter_grid(parameters):
+    """
+    Create every combination of the parameter values.
+
+    Parameters:
+    - parameters: A dictionary of parameter name to a list of values, e.g.
+                  {"NUMBER_OF_LOADSTEPS": [50, 100], "Soil:INTRINSIC_PERMEABILITY_LIQUID": [1e-9, 1e-10]}.
+
+    Returns:
+    - A list of dictionaries with one value for each parameter.
+    """
+    names = list(parameters)
+    return [dict(zip(names, values)) for values in itertools.product(*(parameters[name] for name in names))]
+
+
+def link_or_copy(source, destination):
+    # Purpose: Hard link a file so unchanged files don't take up disk space, copy it if linking isn't possible
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def create_variant(base_folder, model_name, variant_folder, overrides, input_extensions=SWEEP_INPUT_EXTENSIONS):
+    """
+    Create a variant of a model in its own folder with a set of parameter overrides.
+
+    All input files are hard linked to the base folder. The CPS and GOM files are written with a
+    temporary file and a rename, which replaces the link, so the files of the base folder are never changed.
+    If the variant folder exists (e.g. the sweep is run again) it is deleted and created again, so no results
+    or overrides of the earlier run are left in it.
+
+    Parameters:
+    - base_folder: The .A3D folder of the base model.
+    - model_name: The name of the model (the file names without extension).
+    - variant_folder: The folder to create the variant in.
+    - overrides: A dictionary of parameter name to value. Names are CPS keys (e.g. "COURANT_NUMBER") or
+                 "<material name>:<GOM key>" for material parameters (e.g. "Soil:YOUNG_MODULUS").
+    - input_extensions: Extensions of the files of the base folder that are needed to run the model.
+    """
+    if os.path.isdir(variant_folder):
+        shutil.rmtree(variant_folder)
+    os.makedirs(variant_folder)
+
+    with os.scandir(base_folder) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(tuple(input_extensions)):
+                link_or_copy(entry.path, os.path.join(variant_folder, entry.name))
+
+    cps_overrides = {key: value for key, value in overrides.items() if ":" not in key}
+    gom_overrides = {key: value for key, value in overrides.items() if ":" in key}
+
+    if cps_overrides:
+        cps = cps_file(os.path.join(variant_folder, f"{model_name}.CPS_001"))
+        cps.update(cps_overrides)
+        cps.write()
+
+    if gom_overrides:
+        gom = gom_file(os.path.join(variant_folder, f"{model_name}.GOM"))
+        for key, value in gom_overrides.items():
+            material_name, material_key = key.split(":", 1)
+            if material_name not in gom.materials:
+                raise KeyError(f"Material '{material_name}' not found in the GOM file")
+            if material_key not in gom.materials[material_name]:
+                raise KeyError(f"Key '{material_key}' not found for material '{material_name}'")
+            gom.materials[material_name][material_key] = str(value)
+        gom.write()
+
+
+def create_sweep(exe_path, base_folder, model_name, variants, sweep_dir, benchmark_name=None):
+    """
+    Create a folder and a model object for each variant of a parameter sweep.
+
+    Parameters:
+    - exe_path: Path to the kernel executable.
+    - base_folder: The .A3D folder of the base model.
+    - model_name: The name of the model.
+    - variants: A list of override dictionaries (see create_variant and parameter_grid).
+    - sweep_dir: Directory in which a variant_NNN folder is created for each variant.
+    - benchmark_name: Optional benchmark in benchmark_info_dict that describes the stages to run.
+
+    Returns:
+    - A list of model objects, one for each variant.
+    """
+    folder_name = os.path.basename(os.path.normpath(base_folder))
+
+    sweep_models = []
+    for i, overrides in enumerate(variants):
+        variant_dir = os.path.join(sweep_dir, f"variant_{i:03d}")
+        variant_folder = os.path.join(variant_dir, folder_name)
+        create_variant(base_folder, model_name, variant_folder, overrides)
+
+        # Run the linked executable if it lives inside of the base folder
+        variant_exe = relocate_path(exe_path, base_folder, variant_folder)
+
+        variant_model = model(variant_exe, variant_folder, model_name,
+                              benchmark=benchmark_name is not None, benchmark_name=benchmark_name)
+        variant_model.log_file = os.path.join(variant_dir, f"{model_name}.log")
+        sweep_models.append(variant_model)
+
+    return sweep_models
+
+
+def run_parameter_sweep(exe_path, base_folder, model_name, variants, sweep_dir, benchmark_name=None, max_workers=None, collect_results=None):
+    """
+    Create and run all variants of a parameter sweep and collect the results in a table.
+
+    Parameters:
+    - exe_path: Path to the kernel executable.
+    - base_folder: The .A3D folder of the base model.
+    - model_name: The name of the model.
+    - variants: A list of override dictionaries (see create_variant and parameter_grid).
+    - sweep_dir: Directory in which a variant_NNN folder is created for each variant.
+    - benchmark_name: Optional benchmark in benchmark_info_dict that describes the stages to run.
+    - max_workers: Number of variants that run at the same time. Defaults to the number of cores.
+    - collect_results: Optional function that takes a finished model and returns a dict of values for the table.
+
+    Returns:
+    - A DataFrame with a row for each variant with its parameters, folder, wall time, exit status
+      and the values returned by collect_results.
+    """
+    sweep_models = create_sweep(exe_path, base_folder, model_name, variants, sweep_dir, benchmark_name)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    def run_variant(variant_model, overrides):
+        # Purpose: Run a variant and add its parameters and collected results to the run information
+        result = dict(overrides)
+        result.update(run_benchmark_timed(variant_model))
+        if collect_results is not None and result["error"] is None:
+            try:
+                result.update(collect_results(variant_model))
+            except Exception as e:
+                result["error"] = f"Collecting results failed: {e}"
+        return result
+
+    # The kernel runs in a subprocess so threads are enough to run the variants concurrently
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(run_variant, sweep_models, variants))
+
+    return pd.DataFrame(results)
@@ -0,0 +1,263 @@
+import asyncio
+import os
+import re
+import time
+
+from lib.general_functions.compressed_io import iter_result_lines
+
+# Patterns of the kernel output lines that are turned into progress events
+LOAD_STEP_PATTERN = re.compile(r"Calculation of load step\s+(\d+)")
+VALUE_PATTERN = re.compile(r"(MaxWaveSpeed|MinTimeStep|TimeIncrement)\s*:\s*(\S+)")
+FINISHED_PATTERN = re.compile(r"Calculation finished")
+
+# Number of bytes before the read offset of the .OUT file that are compared to find out if the file was rewritten
+OUT_FILE_SIGNATURE_BYTES = 64
+
+
+def parse_progress_line(line):
+    """
+    Parse a line of kernel output into a progress event.
+
+    Parameters:
+    - line: A line from the kernel stdout or the .OUT file.
+
+    Returns:
+    - A dictionary with the event "type" and its values, or None if the line holds no progress information.
+    """
+    match = LOAD_STEP_PATTERN.search(line)
+    if match:
+        return {"type": "load_step", "step": int(match.group(1))}
+
+    match = VALUE_PATTERN.search(line)
+    if match:
+        try:
+            return {"type": match.group(1), "value": float(match.group(2))}
+        except ValueError:
+            return None
+
+    if FINISHED_PATTERN.search(line):
+        return {"type": "finished"}
+
+    return None
+
+
+def read_out_file_events(out_file):
+    """
+    Parse the progress events of a finished run from its .OUT file.
+
+    Parameters:
+    - out_file: Path to the .OUT file, it can be compressed or inside of a zip archive.
+
+    Returns:
+    - A list of event dictionaries (see parse_progress_line), the other events hold the "step" they belong to.
+    """
+    events = []
+    step = None
+    for line in iter_result_lines(out_file):
+        event = parse_progress_line(line)
+        if event is None:
+            continue
+        if event["type"] == "load_step":
+            step = event["step"]
+        else:
+            event["step"] = step
+        events.append(event)
+    return events
+
+
+class progress_tracker:
+    # Purpose: Turn parsed lines into events with the rate and the estimated time remaining of a run
+
+    def __init__(self, total_steps=None):
+        self.total_steps = total_steps
+        self.start_time = time.perf_counter()
+        self.first_step = None
+        self.current_step = None
+
+        # Events that have been emitted, so lines that are both in stdout and the .OUT file are reported once
+        self.seen = set()
+
+    def update(self, line, source):
+        # Purpose: Return the event for a line or None if there is nothing new
+        event = parse_progress_line(line)
+        if event is None:
+            return None
+
+        if event["type"] == "load_step":
+            key = ("load_step", event["step"])
+        else:
+            key = (event["type"], self.current_step)
+        if key in self.seen:
+            return None
+        self.seen.add(key)
+
+        elapsed = time.perf_counter() - self.start_time
+        event["source"] = source
+        event["elapsed"] = elapsed
+
+        if event["type"] == "load_step":
+            # The step numbers continue over stages so count from the first step of this run
+            self.current_step = event["step"]
+            if self.first_step is None:
+                self.first_step = event["step"]
+            steps_done = self.current_step - self.first_step
+
+            event["steps_per_second"] = steps_done / elapsed if steps_done > 0 and elapsed > 0 else None
+            event["eta"] = None
+            if self.total_steps is not None and event["steps_per_second"]:
+                steps_left = max(self.total_steps - steps_done, 0)
+                event["eta"] = steps_left / event["steps_per_second"]
+        else:
+            event["step"] = self.current_step
+
+        return event
+
+
+async def _read_stdout(process, tracker, queue, log_file):
+    # Purpose: Put the events from the kernel stdout on the queue
+    while True:
+        raw_line = await process.stdout.readline()
+        if not raw_line:
+            break
+        line = raw_line.decode(errors="replace")
+        if log_file is not None:
+            log_file.write(line)
+        event = tracker.update(line, "stdout")
+        if event is not None:
+            await queue.put(event)
+
+
+def _out_file_position(out_file):
+    # Purpose: Get the end of the .OUT file of a previous run and its last bytes, before the kernel is started
+    try:
+        with open(out_file, "rb") as file:
+            file.seek(max(os.fstat(file.fileno()).st_size - OUT_FILE_SIGNATURE_BYTES, 0))
+            signature = file.read()
+            return file.tell(), signature
+    except OSError:
+        return 0, b""
+
+
+async def _tail_out_file(out_file, tracker, queue, poll_interval, stop, position=(0, b"")):
+    # Purpose: Put the events from the lines that are appended to the .OUT file on the queue
+
+    # Skip the output of a previous run (see _out_file_position). The bytes before the offset are remembered, if the
+    # kernel truncates and rewrites the file it gets shorter than the offset or these bytes change, and it is read from the start
+    offset, signature = position
+    partial_line = ""
+
+    while True:
+        finished = stop.is_set()
+        try:
+            with open(out_file, "rb") as file:
+                # The size of the open file, so a truncation between a stat and the open can't be missed
+                size = os.fstat(file.fileno()).st_size
+                rewritten = size < offset
+                if not rewritten and signature:
+                    file.seek(offset - len(signature))
+                    rewritten = file.read(len(signature)) != signature
+                if rewritten:
+                    offset = 0
+                    signature = b""
+                    partial_line = ""
+
+                file.seek(offset)
+                data = file.read()
+                offset += len(data)
+                signature = (signature + data)[-OUT_FILE_SIGNATURE_BYTES:]
+            text = data.decode(errors="replace")
+        except FileNotFoundError:
+            text = ""
+
+        if text:
+            lines = (partial_line + text).split("\n")
+            partial_line = lines.pop()
+            for line in lines:
+                event = tracker.update(line, "out_file")
+                if event is not None:
+                    await queue.put(event)
+
+        if finished:
+            break
+        try:
+            await asyncio.wait_for(stop.wait(), poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def monitor_executable(executable_path, argument, out_file=None, total_steps=None, log_file=None, poll_interval=0.5, result=None,
+                             profiler=None, env=None):
+    """
+    Run the executable and yield progress events while it runs.
+
+    The kernel stdout and the .OUT file are read incrementally. If the consumer stops iterating early
+    the kernel is killed.
+
+    Parameters:
+    - executable_path: Path to the kernel executable.
+    - argument: The argument passed to the kernel (the model path).
+    - out_file: The .OUT file to tail, if None only stdout is used.
+    - total_steps: Number of load steps of the run, used to estimate the time remaining.
+    - log_file: Optional file that the kernel stdout and stderr are written to.
+    - poll_interval: Time in seconds between checks of the .OUT file.
+    - result: Optional dictionary in which the "return_code" of the kernel is stored.
+    - profiler: Optional resource_profiler that samples the kernel process and records the load steps.
+    - env: Optional dictionary of environment variables that are set for the kernel (e.g. OMP_NUM_THREADS).
+
+    Yields:
+    - Event dictionaries with the "type" ("load_step", "MaxWaveSpeed", "MinTimeStep", "TimeIncrement" or "finished"),
+      the "source", the "elapsed" time and the "step". Load step events also hold "steps_per_second" and "eta".
+    """
+    tracker = progress_tracker(total_steps)
+    queue = asyncio.Queue()
+    stop = asyncio.Event()
+
+    # The end of the old .OUT file is found before the kernel can rewrite it
+    out_file_position = _out_file_position(out_file) if out_file is not None else None
+
+    process = await asyncio.create_subprocess_exec(
+        executable_path, argument, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        env=None if env is None else {**os.environ, **env}
+    )
+    if profiler is not None:
+        # The samples and the events are timed from the same start, so the samples can be matched to the load steps
+        profiler.start(process.pid, tracker.start_time)
+
+    log = open(log_file, "a") if log_file is not None else None
+    tasks = [asyncio.ensure_future(_read_stdout(process, tracker, queue, log))]
+    if out_file is not None:
+        tasks.append(asyncio.ensure_future(_tail_out_file(out_file, tracker, queue, poll_interval, stop, out_file_position)))
+
+    async def wait_for_process():
+        await tasks[0]
+        await process.wait()
+        stop.set()
+        await asyncio.gather(*tasks[1:])
+        await queue.put(None)
+
+    waiter = asyncio.ensure_future(wait_for_process())
+
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            if profiler is not None and event["type"] == "load_step":
+                profiler.mark_step(event["step"], event["elapsed"])
+            yield event
+    finally:
+        # Kill the kernel if the consumer stopped before the run finished
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        if profiler is not None:
+            profiler.stop()
+        stop.set()
+        for task in tasks + [waiter]:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, waiter, return_exceptions=True)
+        if log is not None:
+            log.close()
+        if result is not None:
+            result["return_code"] = process.returncode
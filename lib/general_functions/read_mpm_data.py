@@ -1,9 +1,13 @@
 import os
-import glob
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 
+from lib.general_functions.par_cache import read_par_file, load_par_cache
+from lib.general_functions.retention import COMPRESSED_EXTENSIONS, strip_compression_extension
+from lib.general_functions.compressed_io import open_result_file, result_path_exists, list_result_files
+
 def process_parfiles(directories):
     """
     Loop through each directory in the list, call the read_par_data function, 
@@ -35,20 +39,23 @@ def process_parfiles(directories):
 
 
 
-def read_par_data(directory, file_pattern_suffix="PAR_*"):
+def read_par_data(directory, file_pattern_suffix="PAR_*", use_cache=True):
     """
     Read MPM data from a specified directory and store DataFrames in a dictionary.
 
     Parameters:
     - directory: The base directory to search for files.
     - file_pattern_suffix: Suffix for the file pattern to find matching files e.g. PAR files.
+    - use_cache: Read the files through the binary PAR cache (see par_cache.py).
+
+    The directory can be inside of a zip archive (e.g. "runs.zip/Foo.A3D") and the PAR files can be compressed.
 
     Returns:
     - A dictionary with DataFrames for each matching file.
     """
 
     # Check if the directory exists
-    if not os.path.exists(directory):
+    if not result_path_exists(directory):
         raise FileNotFoundError(f"The directory '{directory}' does not exist.")
 
     # Get the base name and file name without extension
@@ -59,21 +66,239 @@ def read_par_data(directory, file_pattern_suffix="PAR_*"):
     print("file name:", file_name)
 
     # Find all files matching the pattern
-    file_pattern = f"{directory}/{file_name}.{file_pattern_suffix}"
-    matching_files = glob.glob(file_pattern) # matching files 
+    matching_files = find_par_files(directory, file_pattern_suffix)
 
     # Store DataFrames in a dictionary
     dataframe_dict = {}
 
     # Read each file into the dictionary with filename as key
     for file in matching_files:
-        key = file.split('\\')[-1]  # Get the filename without the extension
-        df = pd.read_csv(file, sep="\s+")
+        key = get_par_key(file)
+        df = read_par_file(file, use_cache=use_cache)
         dataframe_dict[key] = df
 
     return dataframe_dict
 
 
+def find_par_files(directory, file_pattern_suffix="PAR_*"):
+    # Purpose: Find the files in a .A3D directory that match <model name>.<file_pattern_suffix>
+    # The directory can be inside of a zip archive
+    base_name = os.path.basename(directory)
+    file_name = os.path.splitext(base_name)[0]
+
+    return list_result_files(directory, f"{file_name}.{file_pattern_suffix}") # matching files 
+
+
+def get_par_key(file):
+    # Purpose: Get the key under which a PAR file is stored in the dictionary of DataFrames
+    # Compressed files (see retention.py) have the key of the file before compression
+    return strip_compression_extension(file.split('\\')[-1])  # Get the filename without the extension
+
+
+def _read_par_file_timed(file, use_cache):
+    # Purpose: Read a PAR file and time it, errors are returned so one bad file doesn't stop the others
+    start_time = time.perf_counter()
+    try:
+        df = read_par_file(file, use_cache=use_cache)
+        error = None
+    except Exception as e:
+        df = None
+        error = f"{type(e).__name__}: {e}"
+    return df, time.perf_counter() - start_time, error
+
+
+def process_parfiles_parallel(directories, max_workers=None, use_processes=False, file_pattern_suffix="PAR_*", use_cache=True):
+    """
+    Read the PAR files of several directories concurrently.
+
+    Parameters:
+    - directories: A list of directory paths to process, they can be inside of a zip archive (e.g. "runs.zip/Foo.A3D").
+    - max_workers: Number of files that are read at the same time (the executor default if None).
+    - use_processes: Use a process pool instead of a thread pool.
+    - file_pattern_suffix: Suffix for the file pattern to find matching files e.g. PAR files.
+    - use_cache: Read the files through the binary PAR cache (see par_cache.py).
+
+    Returns:
+    - A dictionary where keys are directory paths and values are dictionaries of DataFrames (same as process_parfiles).
+    - A summary dictionary with:
+        - "directories": a list with the "directory", "num_files" and "error" of each directory.
+        - "files": a list with the "directory", "file", "key", "num_rows", "time" and "error" of each file.
+        - "total_time": The wall time of the whole read.
+    """
+    start_time = time.perf_counter()
+    summary = {"directories": [], "files": [], "total_time": None}
+
+    # Find the files of every directory first so they can all be read from one pool
+    files_to_read = []
+    for dir in directories:
+        # The directory can be inside of a zip archive (e.g. "runs.zip/Foo.A3D")
+        if not result_path_exists(dir):
+            summary["directories"].append({"directory": dir, "num_files": 0, "error": f"The directory '{dir}' does not exist."})
+            continue
+
+        matching_files = find_par_files(dir, file_pattern_suffix)
+        error = None if matching_files else f"No data found in '{dir}'"
+        summary["directories"].append({"directory": dir, "num_files": len(matching_files), "error": error})
+        files_to_read.extend((dir, file) for file in matching_files)
+
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=max_workers) as executor:
+        futures = [executor.submit(_read_par_file_timed, file, use_cache) for _, file in files_to_read]
+        results = [future.result() for future in futures]
+
+    par_dataframes_by_directory = {}
+    for (dir, file), (df, read_time, error) in zip(files_to_read, results):
+        key = get_par_key(file)
+        summary["files"].append({
+            "directory": dir,
+            "file": file,
+            "key": key,
+            "num_rows": None if df is None else len(df),
+            "time": read_time,
+            "error": error,
+        })
+        if df is not None:
+            par_dataframes_by_directory.setdefault(dir, {})[key] = df
+
+    summary["total_time"] = time.perf_counter() - start_time
+
+    return par_dataframes_by_directory, summary
+
+
+def read_par_window(file_path, variables=None, time_window=None, time_column="Time", chunksize=100000, use_cache=True):
+    """
+    Read only the requested columns and the rows inside a time window of a PAR file.
+
+    If the PAR cache is up to date the rows are sliced from the memory-mapped columns. Otherwise the
+    text file is streamed in chunks, so only the selected rows are ever held in memory.
+
+    The PAR times are sorted, so reading stops at the first row after the window that only follows rows in
+    time order (see _window_stop). Both ways of reading give the same rows, whatever the chunksize.
+
+    Parameters:
+    - file_path: Path to the PAR file.
+    - variables: A list of variable names to read (e.g., ["Uy", "Time"]), all columns if None.
+    - time_window: Optional (start_time, end_time) tuple, both ends are included.
+    - time_column: Name of the time column used for the window.
+    - chunksize: Number of rows parsed at a time when the text file is streamed.
+    - use_cache: Use the binary PAR cache if it is up to date.
+
+    Returns:
+    - A DataFrame with the requested columns and rows. A KeyError is raised if a column isn't in the file.
+    """
+    # The time column is needed to filter the rows even if it isn't requested
+    columns = None if variables is None else list(variables)
+    read_columns = columns
+    if columns is not None and time_window is not None and time_column not in columns:
+        read_columns = columns + [time_column]
+
+    data = load_par_cache(file_path, read_columns) if use_cache else None
+    if data is not None:
+        if time_window is not None:
+            _check_par_columns(data.keys(), [time_column])
+            times = data[time_column]
+            if np.all(times[1:] >= times[:-1]):
+                # The PAR times are sorted, so the window is a single slice
+                start = np.searchsorted(times, time_window[0], side="left")
+                end = np.searchsorted(times, time_window[1], side="right")
+                rows = slice(start, end)
+            else:
+                stop, _ = _window_stop(times, time_window[1])
+                times = times[:stop]
+                rows = np.flatnonzero((times >= time_window[0]) & (times <= time_window[1]))
+            data = {name: values[rows] for name, values in data.items()}
+        df = pd.DataFrame(data)
+        return df if columns is None else df[columns]
+
+    chunks = []
+    with open_result_file(file_path) as stream:
+        # The header is checked first so a missing column raises the same error as with the cache
+        file_columns = stream.readline().decode().split()
+        _check_par_columns(file_columns, (read_columns or []) + ([time_column] if time_window is not None else []))
+
+        in_order = True
+        previous_time = None
+        with pd.read_csv(stream, sep=r"\s+", header=None, names=file_columns, usecols=read_columns, chunksize=chunksize) as reader:
+            for chunk in reader:
+                if time_window is None:
+                    chunks.append(chunk)
+                    continue
+
+                times = chunk[time_column].to_numpy()
+                stop = None
+                if in_order and len(times):
+                    stop, in_order = _window_stop(times, time_window[1], previous_time)
+                    previous_time = times[-1]
+                chunk = chunk.iloc[:stop]
+                times = times[:stop]
+                chunks.append(chunk[(times >= time_window[0]) & (times <= time_window[1])])
+
+                # The rest of the file is after the window
+                if stop is not None:
+                    break
+
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=read_columns)
+    return df if columns is None else df[columns]
+
+
+def _check_par_columns(available, required):
+    # Purpose: Raise a KeyError if a column isn't in a PAR file
+    missing = [name for name in required if name not in available]
+    if missing:
+        raise KeyError(f"Missing variables in the PAR file: {', '.join(missing)}")
+
+
+def _window_stop(times, end_time, previous_time=None):
+    """
+    Find the row where reading a time window stops.
+
+    Parameters:
+    - times: The times of the rows (a chunk of the file or the whole file).
+    - end_time: The end of the window.
+    - previous_time: The time of the row before the first row, None at the start of the file.
+
+    Returns:
+    - A (stop, in_order) tuple: the first row after the window end that only follows rows in time order (None if
+      there is no such row) and whether all of the rows are in time order.
+    """
+    times = np.asarray(times)
+    previous = times[:1] if previous_time is None else np.array([previous_time])
+    out_of_order = np.flatnonzero(times < np.concatenate((previous, times[:-1])))
+    first_out_of_order = out_of_order[0] if len(out_of_order) else len(times)
+
+    past_window = np.flatnonzero(times[:first_out_of_order] > end_time)
+    stop = int(past_window[0]) if len(past_window) else None
+    return stop, len(out_of_order) == 0
+
+
+class time_index:
+    # Purpose: Sorted index of a time column to find the rows closest to many target times at once
+
+    def __init__(self, times):
+        times = np.asarray(times, dtype=float)
+
+        # A stable sort keeps equal times in their original order
+        self.order = np.argsort(times, kind="stable")
+        self.sorted_times = times[self.order]
+
+    def nearest(self, target_times):
+        # Purpose: Return the row index closest to each target time, the first row is used for ties (same as np.argmin)
+        target_times = np.asarray(target_times, dtype=float)
+        if len(self.sorted_times) == 0:
+            raise IndexError("The time index is empty.")
+
+        right = np.clip(np.searchsorted(self.sorted_times, target_times, side="left"), 0, len(self.sorted_times) - 1)
+        left = np.clip(right - 1, 0, len(self.sorted_times) - 1)
+
+        use_left = np.abs(target_times - self.sorted_times[left]) <= np.abs(self.sorted_times[right] - target_times)
+        nearest = np.where(use_left, left, right)
+
+        # Go to the first of the rows that share the nearest time
+        nearest = np.searchsorted(self.sorted_times, self.sorted_times[nearest], side="left")
+
+        return self.order[nearest]
+
+
 # def plot_analytical_numerical_solutions(par_dataframes_by_directory, u_z, DepthArray, NondimensionalTime, TractionLoad):
 #     """
 #     Plot analytical and numerical solutions for each directory in par_dataframes_by_directory.
@@ -153,13 +378,23 @@ def read_par_data(directory, file_pattern_suffix="PAR_*"):
 
 
 
-def plot_analytical_numerical_solutions(par_dataframes_by_directory, u_z, DepthArray, NondimensionalTime, TractionLoad):
+def plot_analytical_numerical_solutions(par_dataframes_by_directory, u_z, DepthArray, NondimensionalTime, TractionLoad,
+                                        output_dir=None, file_format="png", max_workers=None):
     if TractionLoad == 0:
         raise ValueError("TractionLoad must not be zero.")
 
     if not par_dataframes_by_directory:
         raise ValueError("The provided 'par_dataframes_by_directory' is empty.")
 
+    # Write the figures to output_dir without a display instead of showing them
+    if output_dir is not None:
+        from lib.general_functions.validation_plots import render_validation_figures
+        return render_validation_figures(par_dataframes_by_directory, u_z, DepthArray, NondimensionalTime, TractionLoad,
+                                         output_dir, file_format, max_workers)
+
+    # pyplot is only imported when figures are shown, reading PAR files doesn't need it
+    import matplotlib.pyplot as plt
+
     # Define line styles, markers, and colors for variety
     line_styles = ["-", "--", ":", "-."]
     markers = ["o", "s", "^", "d"]
@@ -189,10 +424,13 @@ def plot_analytical_numerical_solutions(par_dataframes_by_directory, u_z, DepthA
             if not all(col in df.columns for col in required_columns):
                 raise KeyError(f"Missing required columns in DataFrame '{key}'")
 
+            # Find the rows closest to all of the target times at once
+            closest_indices = time_index(df["Time"]).nearest(NondimensionalTime)
+
             for j, t in enumerate(NondimensionalTime):
                 color = colors[j % len(colors)]
 
-                closest_index = np.argmin(np.abs(df["Time"] - t))
+                closest_index = closest_indices[j]
 
                 # Ensure the closest index is within bounds
                 if closest_index >= len(df):
@@ -225,7 +463,101 @@ def plot_analytical_numerical_solutions(par_dataframes_by_directory, u_z, DepthA
 
 
 
-def get_par_variables(directory, par_number, variables):
+def interpolate_analytical_solution(u_z, DepthArray, depths):
+    """
+    Linearly interpolate the analytical solution to the depths of the material points for every time at once.
+
+    Parameters:
+    - u_z: Analytical solution with shape (len(DepthArray), number of times).
+    - DepthArray: Increasing array of the depths of the analytical solution.
+    - depths: Depths of the material points with shape (number of points, number of times).
+
+    Returns:
+    - The analytical solution at the given depths with the same shape as depths.
+    """
+    DepthArray = np.asarray(DepthArray, dtype=float)
+    depths = np.clip(np.asarray(depths, dtype=float), DepthArray[0], DepthArray[-1])
+
+    # Index of the depth interval that each point is in and the position in that interval
+    upper = np.clip(np.searchsorted(DepthArray, depths, side="right"), 1, len(DepthArray) - 1)
+    lower = upper - 1
+    weight = (depths - DepthArray[lower]) / (DepthArray[upper] - DepthArray[lower])
+
+    time_columns = np.arange(depths.shape[1])[np.newaxis, :]
+    return (1 - weight) * u_z[lower, time_columns] + weight * u_z[upper, time_columns]
+
+
+def compute_error_metrics(par_dataframes_by_directory, u_z, DepthArray, NondimensionalTime, TractionLoad):
+    """
+    Compare the numerical pore pressures with the analytical solution for all directories at once.
+
+    For each PAR file the row closest to each target time is used. The analytical solution is interpolated
+    to the depth (Y) of the material point at that row.
+
+    Parameters:
+    - par_dataframes_by_directory: Dictionary with DataFrames from different directories.
+    - u_z: Analytical solution data with shape (len(DepthArray), len(NondimensionalTime)).
+    - DepthArray: Array representing depths.
+    - NondimensionalTime: Array of target times.
+    - TractionLoad: Traction load for normalization.
+
+    Returns:
+    - A dictionary with:
+        - "directories": The directory keys in the order of the rows of the error arrays.
+        - "times": The target times in the order of the columns of the error arrays.
+        - "l2", "linf", "rms": Arrays with shape (number of directories, number of times) of the
+          L2 norm, maximum absolute value and root mean square of the error.
+        - "num_points": The number of material points (PAR files) of each directory.
+    """
+    if TractionLoad == 0:
+        raise ValueError("TractionLoad must not be zero.")
+
+    if not par_dataframes_by_directory:
+        raise ValueError("The provided 'par_dataframes_by_directory' is empty.")
+
+    required_columns = ["Time", "WPressure", "Y"]
+    directories = list(par_dataframes_by_directory)
+    times = np.asarray(NondimensionalTime, dtype=float)
+
+    # Collect the rows closest to the target times of every PAR file, shape (points, times)
+    pressures = []
+    depths = []
+    run_ids = []
+    for run_id, dir_key in enumerate(directories):
+        for key, df in par_dataframes_by_directory[dir_key].items():
+            if not all(col in df.columns for col in required_columns):
+                raise KeyError(f"Missing required columns in DataFrame '{key}'")
+
+            closest_indices = time_index(df["Time"]).nearest(times)
+            pressures.append(df["WPressure"].to_numpy()[closest_indices])
+            depths.append(df["Y"].to_numpy()[closest_indices])
+            run_ids.append(run_id)
+
+    num_runs = len(directories)
+    num_points = np.bincount(run_ids, minlength=num_runs) if run_ids else np.zeros(num_runs, dtype=int)
+    if not run_ids:
+        empty = np.full((num_runs, len(times)), np.nan)
+        return {"directories": directories, "times": times, "l2": empty, "linf": empty.copy(), "rms": empty.copy(), "num_points": num_points}
+
+    numerical = np.array(pressures) / TractionLoad
+    analytical = interpolate_analytical_solution(np.asarray(u_z), DepthArray, np.array(depths))
+    error = numerical - analytical
+    run_ids = np.array(run_ids)
+
+    # Reduce the errors of the points of each run
+    sum_squared = np.zeros((num_runs, len(times)))
+    np.add.at(sum_squared, run_ids, error ** 2)
+    max_abs = np.full((num_runs, len(times)), np.nan)
+    np.fmax.at(max_abs, run_ids, np.abs(error))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rms = np.sqrt(sum_squared / num_points[:, np.newaxis])
+    l2 = np.where(num_points[:, np.newaxis] > 0, np.sqrt(sum_squared), np.nan)
+
+    return {"directories": directories, "times": times, "l2": l2, "linf": max_abs, "rms": rms, "num_points": num_points}
+
+
+def get_par_variables(directory, par_number, variables, use_cache=True):
     """
     Retrieve specified variables from a given directory and PAR file number.
 
@@ -233,31 +565,32 @@ def get_par_variables(directory, par_number, variables):
     - directory: The base directory where the PAR files are stored.
     - par_number: The PAR file number to search for.
     - variables: A list of variable names to return (e.g., ["Uy", "Time"]).
+    - use_cache: Read the file through the binary PAR cache (see par_cache.py).
 
     Returns:
     - A dictionary with the specified variables, or an error message if the file/variables don't exist.
     """
 
-    # Check if the directory exists
-    if not os.path.exists(directory):
+    # Check if the directory exists (it can be inside of a zip archive)
+    if not result_path_exists(directory):
         return {"error": f"The directory '{directory}' does not exist."}
 
     # Create the pattern to find the correct PAR file based on the given number
-    file_pattern = f"{directory}/*PAR_{str(par_number).zfill(3)}"
-    matching_files = glob.glob(file_pattern)
+    # Compressed PAR files are found as well
+    file_pattern = f"*PAR_{str(par_number).zfill(3)}"
+    matching_files = list_result_files(directory, file_pattern)
+    matching_files += [file for extension in COMPRESSED_EXTENSIONS for file in list_result_files(directory, file_pattern + extension)]
 
     if not matching_files:
         return {"error": f"No PAR file found with the number '{par_number}' in '{directory}'."}
 
     # Read the first matching file
     file_path = matching_files[0]
-    df = pd.read_csv(file_path, delim_whitespace=True)
-
-    # Check if the specified variables exist in the DataFrame
-    missing_vars = [var for var in variables if var not in df.columns]
-
-    if missing_vars:
-        return {"error": f"Missing variables in the PAR file: {', '.join(missing_vars)}"}
+    # Only the requested variables are loaded from the cache
+    try:
+        df = read_par_file(file_path, columns=variables, use_cache=use_cache)
+    except KeyError as e:
+        return {"error": e.args[0]}
 
     # Return a dictionary with the specified variables
     result = {var: df[var] for var in variables}
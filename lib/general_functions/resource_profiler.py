@@ -0,0 +1,170 @@
+import os
+import time
+import threading
+import numpy as np
+
+# Conversion of the /proc values to seconds and bytes
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def read_proc_sample(pid):
+    """
+    Read the resource usage of a process from /proc (Linux only).
+
+    Parameters:
+    - pid: The process id.
+
+    Returns:
+    - A dictionary with the "cpu_time" (s), "rss" (bytes), "num_threads" and the "read_bytes" and "write_bytes"
+      that the process read from and wrote to storage, or None if the process is gone. Reads that are served from
+      the page cache are not counted. The I/O values are None if /proc/<pid>/io can't be read.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "r") as file:
+            stat = file.read()
+    except OSError:
+        return None
+
+    # The name of the process is between brackets and can contain spaces, the fields after it start at field 3
+    fields = stat[stat.rindex(")") + 2:].split()
+    if fields[0] == "Z":
+        # The process has finished and is waiting to be reaped
+        return None
+
+    sample = {
+        "cpu_time": (int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+        "rss": int(fields[21]) * PAGE_SIZE,
+        "num_threads": int(fields[17]),
+        "read_bytes": None,
+        "write_bytes": None,
+    }
+
+    try:
+        with open(f"/proc/{pid}/io", "r") as file:
+            io = dict(line.split(":") for line in file.read().splitlines() if ":" in line)
+        sample["read_bytes"] = int(io["read_bytes"])
+        sample["write_bytes"] = int(io["write_bytes"])
+    except (OSError, KeyError, ValueError):
+        pass
+
+    return sample
+
+
+class resource_profiler:
+    # Purpose: Sample the resource usage of a kernel process at a fixed interval and link it to the load steps
+    # Usage: pass it to model.run_stage_profiled, or call start(pid), mark_step(step) and stop() yourself
+    # Sampling uses /proc, on other platforms the time series is empty
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.pid = None
+        self.start_time = None
+        self.end_time = None
+        self.samples = []
+        self.step_times = []
+        self.steps = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, pid, start_time=None):
+        # Purpose: Start sampling a process in a background thread
+        # start_time is the time.perf_counter() value that elapsed times are measured from, defaults to now
+        self.pid = pid
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            sample = read_proc_sample(self.pid)
+            if sample is None:
+                break
+            sample["elapsed"] = time.perf_counter() - self.start_time
+            self.samples.append(sample)
+            if self._stop.wait(self.interval):
+                break
+
+    def mark_step(self, step, elapsed=None):
+        # Purpose: Record the time at which the kernel started a load step
+        # elapsed is the time since start_time at which the step was seen, defaults to now
+        self.step_times.append(time.perf_counter() - self.start_time if elapsed is None else elapsed)
+        self.steps.append(step)
+
+    def stop(self):
+        # Purpose: Stop sampling
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.end_time = time.perf_counter()
+
+    def time_series(self):
+        """
+        Get the samples as a table.
+
+        Returns:
+        - A DataFrame with a row per sample with the "elapsed" time, the resource usage (see read_proc_sample)
+          and the load "step" that was running at that time (NaN before the first load step).
+        """
+        # pandas is only imported here, so running a model with a profiler doesn't load it
+        import pandas as pd
+
+        columns = ["elapsed", "cpu_time", "rss", "num_threads", "read_bytes", "write_bytes"]
+        series = pd.DataFrame(self.samples, columns=columns)
+
+        # The step of a sample is the last step that started before it
+        position = np.searchsorted(np.array(self.step_times), series["elapsed"].to_numpy(), side="right") - 1
+        steps = np.array(self.steps + [np.nan], dtype=float)
+        series["step"] = np.where(position >= 0, steps[position], np.nan)
+        return series
+
+    def summary(self):
+        """
+        Summarize the run.
+
+        Returns:
+        - A dictionary with the "duration", the peak and mean RSS, the CPU time and "cpu_utilization"
+          (CPU time over duration, above 1 if more than one core is used), the maximum number of threads, the bytes
+          read and written with their rates, the number of load steps and the "seconds_per_step".
+          The resource values are None if no samples were taken.
+        """
+        end_time = self.end_time if self.end_time is not None else time.perf_counter()
+        duration = end_time - self.start_time if self.start_time is not None else 0.0
+        summary = {
+            "duration": duration,
+            "num_samples": len(self.samples),
+            "peak_rss": None,
+            "mean_rss": None,
+            "cpu_time": None,
+            "cpu_utilization": None,
+            "max_threads": None,
+            "read_bytes": None,
+            "write_bytes": None,
+            "read_rate": None,
+            "write_rate": None,
+            "num_steps": len(self.steps),
+            "seconds_per_step": None,
+        }
+
+        if len(self.steps) > 1:
+            summary["seconds_per_step"] = (self.step_times[-1] - self.step_times[0]) / (len(self.steps) - 1)
+
+        if not self.samples:
+            return summary
+
+        series = self.time_series()
+        last = self.samples[-1]
+        summary["peak_rss"] = int(series["rss"].max())
+        summary["mean_rss"] = float(series["rss"].mean())
+        summary["cpu_time"] = last["cpu_time"]
+        summary["max_threads"] = int(series["num_threads"].max())
+        if duration > 0:
+            summary["cpu_utilization"] = last["cpu_time"] / duration
+        if last["write_bytes"] is not None:
+            summary["read_bytes"] = last["read_bytes"]
+            summary["write_bytes"] = last["write_bytes"]
+            if duration > 0:
+                summary["read_rate"] = last["read_bytes"] / duration
+                summary["write_rate"] = last["write_bytes"] / duration
+        return summary
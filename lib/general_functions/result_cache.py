@@ -0,0 +1,164 @@
+import os
+import glob
+import json
+import time
+import shutil
+
+from lib.general_functions.stage_manifest import hash_bytes, hash_file
+
+# Default location and size of the cache, the location can be changed with the ANURA3D_RESULT_CACHE variable
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "anura3d_results")
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+
+# Libraries next to the executable that are loaded by the kernel (e.g. the material models), they are part of the key
+KERNEL_LIBRARY_PATTERNS = ("*.dll", "*.so", "*.so.*", "*.dylib")
+
+
+def snapshot_folder(folder):
+    # Purpose: Record the size and modification time of the files in a folder to find the outputs of a run later
+    with os.scandir(folder) as entries:
+        return {entry.name: (entry.stat().st_size, entry.stat().st_mtime_ns) for entry in entries if entry.is_file()}
+
+
+class result_cache:
+    # Purpose: Store the output files of runs by a hash of their inputs so identical runs can be restored instead of rerun
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or os.environ.get("ANURA3D_RESULT_CACHE", DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def __str__(self):
+        return f"Result Cache: {self.cache_dir} \nEntries: {len(self.entries())} \nSize: {self.total_bytes()} of {self.max_bytes} bytes"
+
+    def model_key(self, cached_model):
+        """
+        Create the cache key of a model from its inputs.
+
+        Parameters:
+        - cached_model: The model object.
+
+        Returns:
+        - A hash of the model name, the first CPS file, the GOM file, the executable, the kernel libraries next to it
+          (see KERNEL_LIBRARY_PATTERNS) and the benchmark definition. The output files are named after the model,
+          so they can only be restored into a model with the same name.
+        """
+        benchmark_info = getattr(cached_model, "benchmark_info", None)
+        definition = json.dumps(benchmark_info, sort_keys=True, default=str)
+
+        exe_folder = glob.escape(os.path.dirname(os.path.abspath(cached_model.exe_path)))
+        libraries = sorted({library for pattern in KERNEL_LIBRARY_PATTERNS for library in glob.glob(os.path.join(exe_folder, pattern))})
+
+        fingerprints = [
+            hash_file(f"{cached_model.model_path}.CPS_001"),
+            hash_file(f"{cached_model.model_path}.GOM"),
+            hash_file(cached_model.exe_path),
+        ] + [(os.path.basename(library), hash_file(library)) for library in libraries]
+        return hash_bytes(cached_model.model_name.encode(), *(str(fingerprint).encode() for fingerprint in fingerprints),
+                          definition.encode())
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _load_meta(self, key):
+        try:
+            with open(os.path.join(self._entry_dir(key), "meta.json"), "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, entry_dir, meta):
+        temp_path = os.path.join(entry_dir, "meta.json.tmp")
+        with open(temp_path, "w") as file:
+            json.dump(meta, file)
+        os.replace(temp_path, os.path.join(entry_dir, "meta.json"))
+
+    def entries(self):
+        # Purpose: Get the meta data of all entries in the cache by key
+        entries = {}
+        with os.scandir(self.cache_dir) as dirs:
+            for entry in dirs:
+                if entry.is_dir() and not entry.name.endswith(".tmp"):
+                    meta = self._load_meta(entry.name)
+                    if meta is not None:
+                        entries[entry.name] = meta
+        return entries
+
+    def total_bytes(self):
+        # Purpose: Get the size of all of the files in the cache
+        return sum(meta["size"] for meta in self.entries().values())
+
+    def restore(self, key, folder):
+        """
+        Copy the cached output files of a key into a model folder.
+
+        Parameters:
+        - key: The cache key (see model_key).
+        - folder: The model folder to restore the output files to.
+
+        Returns:
+        - True if the key was in the cache and the files were restored, False otherwise. An entry with missing files
+          is removed and counts as a miss.
+        """
+        meta = self._load_meta(key)
+        if meta is None:
+            return False
+
+        entry_dir = self._entry_dir(key)
+        if not all(os.path.isfile(os.path.join(entry_dir, "files", file_name)) for file_name in meta["files"]):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return False
+
+        for file_name in meta["files"]:
+            shutil.copy2(os.path.join(entry_dir, "files", file_name), os.path.join(folder, file_name))
+
+        # Mark the entry as recently used for the eviction
+        meta["last_used"] = time.time()
+        self._save_meta(entry_dir, meta)
+        return True
+
+    def store(self, key, folder, file_names):
+        """
+        Store output files of a model folder under a key and evict the least recently used entries if the cache is too big.
+
+        Parameters:
+        - key: The cache key (see model_key).
+        - folder: The model folder with the output files.
+        - file_names: The names of the output files in the folder.
+        """
+        entry_dir = self._entry_dir(key)
+        temp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(os.path.join(temp_dir, "files"))
+
+        size = 0
+        for file_name in file_names:
+            shutil.copy2(os.path.join(folder, file_name), os.path.join(temp_dir, "files", file_name))
+            size += os.path.getsize(os.path.join(folder, file_name))
+
+        self._save_meta(temp_dir, {"files": list(file_names), "size": size, "last_used": time.time()})
+
+        # Replace the entry in one rename so other processes never see half of an entry
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        try:
+            os.rename(temp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same key at the same time
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self):
+        # Purpose: Remove the least recently used entries until the cache is within max_bytes
+        entries = sorted(self.entries().items(), key=lambda item: item[1]["last_used"])
+        total = sum(meta["size"] for _, meta in entries)
+        for key, meta in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= meta["size"]
+
+    def clear(self):
+        # Purpose: Remove all entries from the cache
+        for key in self.entries():
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
@@ -0,0 +1,225 @@
+import os
+import re
+import time
+import gzip
+import shutil
+import fnmatch
+
+# zstd compression is optional, gzip is always available
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Input files of a model folder that are needed to run it again (the keep list of model.delete_folder_files)
+MODEL_INPUT_EXTENSIONS = ['.CPS_001', '.GOM', '.dll', '.out', '.exe']
+
+RETENTION_ACTIONS = ("keep", "delete", "compress")
+
+# Extensions of compressed files, the PAR readers read these files directly
+COMPRESSED_EXTENSIONS = (".gz", ".zst")
+
+# Files that are written once per step and where the step is in the name: the CPS file of each stage
+# (Foo.CPS_005) and the .vtu files of the VTK export (par_000012.vtu). The number of a PAR file is
+# its material point, all of the steps are in the same file, so PAR files have no step.
+STEP_FILE_PATTERNS = (
+    re.compile(r"^(?P<series>.+\.CPS_)(?P<step>\d+)$"),
+    re.compile(r"^(?P<series>.+_)(?P<step>\d+)\.vtu$"),
+)
+
+
+def strip_compression_extension(file_name):
+    # Purpose: Get the name of a file before it was compressed, e.g. Foo.PAR_001 for Foo.PAR_001.gz
+    for extension in COMPRESSED_EXTENSIONS:
+        if file_name.endswith(extension):
+            return file_name[:-len(extension)]
+    return file_name
+
+
+def keep_extensions_rules(keep_extensions, action="delete"):
+    # Purpose: Create the rules that keep files with one of the extensions and apply action to all other files
+    rules = [{"pattern": [f"*{extension}" for extension in keep_extensions], "action": "keep"}]
+    rules.append({"pattern": "*", "action": action})
+    return rules
+
+
+def _matches(rule, name, age, size):
+    patterns = rule["pattern"] if isinstance(rule["pattern"], (list, tuple)) else [rule["pattern"]]
+    if not any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns):
+        return False
+    if age < rule.get("min_age", 0):
+        return False
+    if size < rule.get("min_size", 0):
+        return False
+    return True
+
+
+def _series_key(name):
+    # Purpose: Split the name of a per step file into the name without its step and the step number
+    # Returns None for files that are not written per step (see STEP_FILE_PATTERNS)
+    for pattern in STEP_FILE_PATTERNS:
+        match = pattern.match(name)
+        if match is not None:
+            return match.group("series") + "#" + name[match.end("step"):], int(match.group("step"))
+    return None
+
+
+def classify_files(directory, rules, default_action="keep", now=None):
+    """
+    Decide what happens to each file in a folder with a single pass over the folder.
+
+    Parameters:
+    - directory: The folder to clean up, sub folders (e.g. the PAR cache) are not touched.
+    - rules: A list of rule dictionaries, the first rule that matches a file decides its action:
+        - "pattern": A file name pattern (e.g. "*.PAR_*") or a list of patterns.
+        - "action": "keep", "delete" or "compress".
+        - "min_age": Optional minimum time in seconds since the file was modified.
+        - "min_size": Optional minimum size of the file in bytes.
+        - "keep_last": Optional number of steps to keep. Only applies to files that are written per step
+          (see STEP_FILE_PATTERNS), these are grouped by their name without the step (e.g. Foo.CPS_004
+          and Foo.CPS_005) and the files with the highest steps in each group are kept. Other files that
+          match the rule (e.g. the PAR files, which are numbered by material point) are kept.
+    - default_action: The action of files that match no rule.
+    - now: The time that the age of the files is measured from, defaults to the current time.
+
+    Returns:
+    - A list of (file name, size, action) tuples.
+    """
+    for rule in rules:
+        if rule["action"] not in RETENTION_ACTIONS:
+            raise ValueError(f"Unknown retention action '{rule['action']}'")
+    if now is None:
+        now = time.time()
+
+    classified = []
+    series = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+
+            rule_index = next((i for i, rule in enumerate(rules)
+                               if _matches(rule, entry.name, now - stat.st_mtime, stat.st_size)), None)
+            action = default_action if rule_index is None else rules[rule_index]["action"]
+
+            # Compressed files are not compressed again
+            if action == "compress" and entry.name.endswith(COMPRESSED_EXTENSIONS):
+                action = "keep"
+
+            classified.append([entry.name, stat.st_size, action])
+            if rule_index is not None and "keep_last" in rules[rule_index]:
+                series_key = _series_key(strip_compression_extension(entry.name))
+                if series_key is None:
+                    # The step of the file isn't known, so it can't be told apart from the last steps
+                    classified[-1][2] = "keep"
+                    continue
+                key, step = series_key
+                series.setdefault((rule_index, key), []).append((step, len(classified) - 1))
+
+    # Keep the files of the last steps of each series
+    for (rule_index, _), files in series.items():
+        keep_last = rules[rule_index]["keep_last"]
+        for _, i in sorted(files, reverse=True)[:keep_last]:
+            classified[i][2] = "keep"
+
+    return [tuple(item) for item in classified]
+
+
+def compress_file(file_path, compression="gzip", chunk_size=1024 * 1024):
+    """
+    Compress a file in chunks and replace it by the compressed file.
+
+    Parameters:
+    - file_path: The file to compress.
+    - compression: "gzip" (.gz) or "zstd" (.zst, needs the zstandard package).
+    - chunk_size: Number of bytes that are compressed at a time.
+
+    Returns:
+    - The path of the compressed file.
+    """
+    if compression == "gzip":
+        compressed_path = f"{file_path}.gz"
+    elif compression == "zstd":
+        if zstandard is None:
+            raise ImportError("zstd compression needs the zstandard package (pip install zstandard)")
+        compressed_path = f"{file_path}.zst"
+    else:
+        raise ValueError(f"Unknown compression '{compression}'")
+
+    # Write to a temporary file so a crash never leaves a half written file with the final name
+    temp_path = f"{compressed_path}.tmp"
+    with open(file_path, "rb") as source, open(temp_path, "wb") as target:
+        if compression == "gzip":
+            with gzip.GzipFile(fileobj=target, mode="wb") as writer:
+                shutil.copyfileobj(source, writer, chunk_size)
+        else:
+            with zstandard.ZstdCompressor().stream_writer(target, closefd=False) as writer:
+                shutil.copyfileobj(source, writer, chunk_size)
+
+    shutil.copystat(file_path, temp_path)
+    os.replace(temp_path, compressed_path)
+    os.remove(file_path)
+    return compressed_path
+
+
+def apply_retention_policy(directory, rules, default_action="keep", dry_run=False, compression="gzip", now=None):
+    """
+    Delete or compress the files of a folder according to a list of rules (see classify_files).
+
+    Parameters:
+    - directory: The folder to clean up.
+    - rules: The list of rules.
+    - default_action: The action of files that match no rule.
+    - dry_run: Only report what would be done.
+    - compression: "gzip" or "zstd", used for the files with the "compress" action.
+    - now: The time that the age of the files is measured from, defaults to the current time.
+
+    Returns:
+    - A report dictionary with the "files" (name, size, action), the number of files per action in "counts",
+      "bytes_deleted", "bytes_compressed" (size of the files before compression), "bytes_reclaimed" and
+      the "errors". In a dry run the space saved by compression isn't known and only deleted bytes are reclaimed.
+    """
+    files = classify_files(directory, rules, default_action, now)
+    report = {
+        "files": files,
+        "counts": {action: 0 for action in RETENTION_ACTIONS},
+        "bytes_deleted": 0,
+        "bytes_compressed": 0,
+        "bytes_reclaimed": 0,
+        "dry_run": dry_run,
+        "errors": [],
+    }
+
+    for name, size, action in files:
+        report["counts"][action] += 1
+        if action == "keep":
+            continue
+
+        file_path = os.path.join(directory, name)
+        try:
+            if action == "delete":
+                if not dry_run:
+                    os.remove(file_path)
+                report["bytes_deleted"] += size
+                report["bytes_reclaimed"] += size
+            else:
+                if not dry_run:
+                    compressed_path = compress_file(file_path, compression)
+                    report["bytes_reclaimed"] += size - os.path.getsize(compressed_path)
+                report["bytes_compressed"] += size
+        except (OSError, ImportError) as e:
+            report["errors"].append(f"{name}: {e}")
+
+    return report
+
+
+def print_retention_report(report):
+    # Purpose: Print a short summary of a retention report
+    prefix = "Would" if report["dry_run"] else "Did"
+    counts = report["counts"]
+    print(f"{prefix} keep {counts['keep']}, delete {counts['delete']} and compress {counts['compress']} files")
+    print(f"Deleted: {report['bytes_deleted'] / 1024 ** 2:.1f} MB, compressed: {report['bytes_compressed'] / 1024 ** 2:.1f} MB, "
+          f"reclaimed: {report['bytes_reclaimed'] / 1024 ** 2:.1f} MB")
+    for error in report["errors"]:
+        print(f"Error: {error}")
@@ -0,0 +1,222 @@
+import numpy as np
+
+
+class box_grid:
+    # Purpose: Find the boxes (e.g. the bounding boxes of elements) that can contain each of many points
+    #
+    # Every box is registered in the cells of a uniform grid that it overlaps. The grid is stored like a sparse
+    # matrix: the box numbers sorted by cell and the start of each cell in that list. A point is only paired
+    # with the boxes of its own cell.
+
+    def __init__(self, lower, upper, cell_size=None):
+        """
+        Build the grid.
+
+        Parameters:
+        - lower: The lower corner of each box (num_boxes x dimension).
+        - upper: The upper corner of each box (num_boxes x dimension).
+        - cell_size: Size of the grid cells, defaults to the average size of the boxes.
+        """
+        lower = np.asarray(lower, dtype=float)
+        upper = np.asarray(upper, dtype=float)
+        self.dimension = lower.shape[1]
+        self.origin = lower.min(axis=0)
+        extent = upper.max(axis=0) - self.origin
+        if cell_size is None:
+            cell_size = float(np.mean((upper - lower).max(axis=1)))
+        # Limit the grid to a few cells per box so a few tiny boxes don't create a huge grid
+        cell_size = max(cell_size, float(np.prod(np.maximum(extent, 1e-300)) / (4 * len(lower))) ** (1 / self.dimension))
+        self.cell_size = cell_size
+        self.shape = np.floor(extent / cell_size).astype(np.int64) + 1
+
+        first = self._cell_coordinates(lower)
+        last = self._cell_coordinates(upper)
+        sizes = last - first + 1
+        counts = np.prod(sizes, axis=1)
+
+        # One row per (box, cell) pair, the cell of each pair is decoded from its position in the box's range
+        box_numbers = np.repeat(np.arange(len(lower)), counts)
+        position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells = np.zeros(len(position), dtype=np.int64)
+        for axis in range(self.dimension):
+            size = sizes[box_numbers, axis]
+            cells = cells * self.shape[axis] + first[box_numbers, axis] + position % size
+            position //= size
+
+        order = np.argsort(cells, kind="stable")
+        self.cell_boxes = box_numbers[order]
+        self.cell_start = np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=int(np.prod(self.shape))))])
+
+    def __str__(self):
+        return f"Box Grid: {tuple(int(size) for size in self.shape)} cells of size {self.cell_size:g}"
+
+    def _cell_coordinates(self, points):
+        return np.clip(np.floor((points - self.origin) / self.cell_size).astype(np.int64), 0, self.shape - 1)
+
+    def _cell_numbers(self, points):
+        # Purpose: Get the grid cell of each point, -1 for points outside of the grid
+        coordinates = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        inside = np.all((coordinates >= 0) & (coordinates < self.shape), axis=1)
+        cells = np.zeros(len(points), dtype=np.int64)
+        for axis in range(self.dimension):
+            cells = cells * self.shape[axis] + coordinates[:, axis]
+        cells[~inside] = -1
+        return cells
+
+    def candidates(self, points):
+        """
+        Pair each point with the boxes of its grid cell.
+
+        Parameters:
+        - points: The point coordinates (num_points x dimension).
+
+        Returns:
+        - The point numbers and the box numbers of the pairs. Every box that contains a point is paired with it.
+        """
+        cells = self._cell_numbers(np.asarray(points, dtype=float))
+        point_numbers = np.flatnonzero(cells >= 0)
+        cells = cells[point_numbers]
+
+        counts = self.cell_start[cells + 1] - self.cell_start[cells]
+        pair_points = np.repeat(point_numbers, counts)
+        position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return pair_points, self.cell_boxes[np.repeat(self.cell_start[cells], counts) + position]
+
+
+class mesh_index:
+    # Purpose: Find the element that contains each of many points and interpolate nodal values at the points
+    #
+    # The bounding box of every element is registered in a box_grid. A point is only tested against the elements
+    # of its own grid cell, so a lookup costs O(points x elements per cell) instead of O(points x elements). Works for triangles (2D) and tetrahedra (3D), elements with more
+    # nodes (e.g. 6-noded triangles) are located and interpolated with their corner nodes.
+
+    def __init__(self, nodes, elements, cell_size=None, tolerance=1e-10):
+        """
+        Build the index of a mesh.
+
+        Parameters:
+        - nodes: The node coordinates (num_nodes x dimension), e.g. gom_file.nodes.
+        - elements: The 1-based element connectivity (num_elements x nodes per element), e.g. gom_file.elements.
+        - cell_size: Size of the grid cells, defaults to the average size of the elements.
+        - tolerance: Barycentric coordinates down to -tolerance count as inside, so points on a side are found.
+        """
+        self.nodes = np.asarray(nodes, dtype=float)
+        self.dimension = self.nodes.shape[1]
+        if self.dimension not in (2, 3):
+            raise ValueError(f"Only 2D and 3D meshes are supported, the nodes have {self.dimension} coordinates")
+        if elements.shape[1] < self.dimension + 1:
+            raise ValueError(f"The elements need at least {self.dimension + 1} nodes in {self.dimension}D")
+
+        self.elements = np.asarray(elements, dtype=np.int64)[:, :self.dimension + 1] - 1
+        self.tolerance = tolerance
+
+        # Affine map from a point to its barycentric coordinates: lambda[1:] = inverse @ (point - first vertex)
+        vertices = self.nodes[self.elements]
+        self.origins = vertices[:, 0]
+        matrices = np.transpose(vertices[:, 1:] - self.origins[:, None], (0, 2, 1))
+        determinants = np.linalg.det(matrices)
+        scale = np.abs(matrices).max(axis=(1, 2)) ** self.dimension
+        self.valid = np.abs(determinants) > 1e-12 * np.maximum(scale, np.finfo(float).tiny)
+        self.inverse = np.zeros_like(matrices)
+        self.inverse[self.valid] = np.linalg.inv(matrices[self.valid])
+
+        self.grid = box_grid(vertices.min(axis=1), vertices.max(axis=1), cell_size)
+        self.cell_size = self.grid.cell_size
+        self.shape = self.grid.shape
+
+    def __str__(self):
+        return f"Mesh Index: {len(self.elements)} elements \nGrid: {tuple(int(size) for size in self.shape)} cells of size {self.cell_size:g}"
+
+    def locate(self, points, chunk_size=250000):
+        """
+        Find the element that contains each point.
+
+        Parameters:
+        - points: The point coordinates (num_points x dimension).
+        - chunk_size: Number of points that are processed at a time, limits the memory use.
+
+        Returns:
+        - The 0-based element number of each point (-1 if it is outside of the mesh) and the barycentric
+          coordinates of the points in their element (num_points x dimension + 1).
+        """
+        points = np.asarray(points, dtype=float)[:, :self.dimension]
+        found = np.full(len(points), -1, dtype=np.int64)
+        weights = np.full((len(points), self.dimension + 1), np.nan)
+
+        for start in range(0, len(points), chunk_size):
+            chunk = points[start:start + chunk_size]
+
+            # Pair every point with each element of its cell
+            pair_points, candidates = self.grid.candidates(chunk)
+
+            local = np.einsum("pij,pj->pi", self.inverse[candidates], chunk[pair_points] - self.origins[candidates])
+            inside = self.valid[candidates] & np.all(local >= -self.tolerance, axis=1) & (local.sum(axis=1) <= 1 + self.tolerance)
+
+            # The first element that contains a point wins (points on a shared side are in both)
+            pair_numbers = np.flatnonzero(inside)
+            matched, first = np.unique(pair_points[pair_numbers], return_index=True)
+            pair_numbers = pair_numbers[first]
+
+            found[start + matched] = candidates[pair_numbers]
+            chosen = local[pair_numbers]
+            weights[start + matched] = np.column_stack([1 - chosen.sum(axis=1), chosen])
+
+        return found, weights
+
+    def interpolate(self, node_values, points, chunk_size=250000):
+        """
+        Interpolate nodal values linearly at points.
+
+        Parameters:
+        - node_values: The values at the nodes (num_nodes, or num_nodes x num_values).
+        - points: The point coordinates (num_points x dimension).
+        - chunk_size: Number of points that are processed at a time.
+
+        Returns:
+        - The values at the points, NaN for points outside of the mesh.
+        """
+        node_values = np.asarray(node_values, dtype=float)
+        found, weights = self.locate(points, chunk_size)
+
+        values = np.full((len(found),) + node_values.shape[1:], np.nan)
+        inside = found >= 0
+        element_values = node_values[self.elements[found[inside]]]
+        values[inside] = np.einsum("pn,pn...->p...", weights[inside], element_values)
+        return values
+
+    def element_average(self, points, values, chunk_size=250000):
+        """
+        Average point values (e.g. material point results) over the element that contains each point.
+
+        Parameters:
+        - points: The point coordinates (num_points x dimension).
+        - values: The value at each point.
+        - chunk_size: Number of points that are processed at a time.
+
+        Returns:
+        - The average value of each element (NaN for elements without points) and the number of points per element.
+        """
+        found, _ = self.locate(points, chunk_size)
+        inside = found >= 0
+        counts = np.bincount(found[inside], minlength=len(self.elements))
+        sums = np.bincount(found[inside], weights=np.asarray(values, dtype=float)[inside], minlength=len(self.elements))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts, counts
+
+
+def add_element_column(index, dataframe, coordinate_columns=("X", "Y"), column_name="Element"):
+    """
+    Add the number of the element that contains each material point to a PAR or material point DataFrame.
+
+    Parameters:
+    - index: A mesh_index of the mesh of the model.
+    - dataframe: A DataFrame with the coordinates of the points.
+    - coordinate_columns: The names of the coordinate columns, e.g. ("X", "Y", "Z") in 3D.
+    - column_name: The name of the new column.
+
+    Returns:
+    - The DataFrame with the 1-based element number of each point (0 if it is outside of the mesh), like the GOM numbering.
+    """
+    found, _ = index.locate(dataframe[list(coordinate_columns)].to_numpy())
+    dataframe[column_name] = found + 1
+    return dataframe
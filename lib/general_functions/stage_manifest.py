@@ -0,0 +1,53 @@
+import os
+import json
+import hashlib
+
+
+def hash_bytes(*contents):
+    # Purpose: Hash several pieces of content into one fingerprint
+    digest = hashlib.sha256()
+    for content in contents:
+        digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    # Purpose: Hash the content of a file without loading it in memory at once, None if it doesn't exist
+    if not os.path.exists(file_path):
+        return None
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    """
+    Load the manifest of the stages that have been run for a model.
+
+    Parameters:
+    - manifest_path: Path to the manifest file.
+
+    Returns:
+    - A dictionary with a "stages" dictionary of stage number (as a string) to the stage record.
+      An empty manifest is returned if the file doesn't exist or can't be read.
+    """
+    try:
+        with open(manifest_path, "r") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {"stages": {}}
+
+    if not isinstance(manifest.get("stages"), dict):
+        return {"stages": {}}
+    return manifest
+
+
+def save_manifest(manifest_path, manifest):
+    # Purpose: Write the manifest with a temporary file and a rename so a crash never leaves it half written
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(manifest, file, indent=4)
+    os.replace(temp_path, manifest_path)
@@ -1,5 +1,7 @@
 import numpy as np
-import matplotlib.pyplot as plt
+
+# Most (depth, time, term) values that are computed at once, about 8 MB per temporary array
+MAX_CHUNK_ELEMENTS = 2 ** 20
 
 def terzaghi_pressure_solution(
     DataPoints,
@@ -13,7 +15,8 @@ def terzaghi_pressure_solution(
     DimensionalTimeInput,
     EndTime,  
     target_times,
-    plot_results
+    plot_results,
+    save_path=None
 ):
 
     GravitationalAcceleration = 9.81 #m/s2
@@ -46,31 +49,24 @@ def terzaghi_pressure_solution(
         NondimensionalTime = target_times
         DimensionalTime = [t * (DrainagePath ** 2) / Cv for t in target_times]
     
-    # Initialize the u_z array
-    u_z = np.zeros((DataPoints, len(NondimensionalTime)))
-    
     # Compute u_z with convergence check
-    for kk in range(len(NondimensionalTime)):
-        for jj in range(DataPoints):
-            converged = False
-            iteration = 0
-            
-            while not converged and iteration < max_iterations:
-                previous_value = u_z[jj, kk]
-                MM = np.pi * ((2 * iteration) + 1) * 0.5
-                term = (2 / MM) * ((-1) ** iteration) * np.cos((MM * DepthArray[jj]) / DrainagePath) * np.exp(-(MM ** 2) * NondimensionalTime[kk])
-                u_z[jj, kk] += term
-                
-                if np.abs(u_z[jj, kk] - previous_value) < tolerance:
-                    converged = True
-                else:
-                    iteration += 1
+    u_z = terzaghi_fourier_series(DepthArray, NondimensionalTime, DrainagePath, tolerance, max_iterations)
 
     # Plotting
     if plot_results:
-       plt.figure(figsize=(10, 6))
-       for kk in range(len(NondimensionalTime)):
-           plt.plot(
+        # matplotlib is only imported when a plot is made, computing the solution doesn't need it
+        if save_path is None:
+            import matplotlib.pyplot as plt
+            plt.figure(figsize=(10, 6))
+            ax = plt.gca()
+        else:
+            # Without pyplot the figure is only written to save_path, no display is needed
+            from matplotlib.figure import Figure
+            fig = Figure(figsize=(10, 6))
+            ax = fig.add_subplot()
+
+        for kk in range(len(NondimensionalTime)):
+            ax.plot(
                 u_z[:, kk],
                 DepthArray,
                 linestyle='-', 
@@ -80,15 +76,76 @@ def terzaghi_pressure_solution(
                 color='black',
                 label=f'NonDimTime= {NondimensionalTime[kk]}'
             )
-        
-
-    plt.ylabel('Depth (meters)')  # X-axis label
-    plt.xlabel('u_z')  # Y-axis label
-    plt.grid(True)  # Add gridlines for better visualization
-    plt.legend()  # Display the legend
-    plt.xlim(0, 1)
-    plt.ylim(0, 1)
-    plt.show()  # Show the plot
+
+        ax.set_ylabel('Depth (meters)')  # X-axis label
+        ax.set_xlabel('u_z')  # Y-axis label
+        ax.grid(True)  # Add gridlines for better visualization
+        ax.legend()  # Display the legend
+        ax.set_xlim(0, 1)
+        ax.set_ylim(0, 1)
+
+        if save_path is None:
+            plt.show()  # Show the plot
+        else:
+            fig.savefig(save_path)  # Write the plot, e.g. to a .png or .svg file
     
     
-    return u_z, DimensionalTime, NondimensionalTime, DepthArray
\ No newline at end of file
+    return u_z, DimensionalTime, NondimensionalTime, DepthArray
+
+
+def terzaghi_fourier_series(DepthArray, NondimensionalTime, DrainagePath, tolerance=1e-10, max_iterations=30,
+                            max_chunk_elements=MAX_CHUNK_ELEMENTS):
+    """
+    Evaluate the Terzaghi pore pressure Fourier series for all depths and times.
+
+    The terms for every (depth, time, term) combination are computed as broadcast arrays, in blocks of
+    depths and times with at most max_chunk_elements values, so the memory use doesn't grow with the grid.
+    A term is only added while all of the previous terms at that point were above the tolerance,
+    which reproduces the per-point convergence check of the original loop.
+
+    Parameters:
+    - DepthArray: Array of depths z.
+    - NondimensionalTime: Array of non-dimensional times.
+    - DrainagePath: Length of the drainage path.
+    - tolerance: Convergence tolerance.
+    - max_iterations: Maximum number of terms in the series.
+    - max_chunk_elements: Most (depth, time, term) values that are computed at once.
+
+    Returns:
+    - u_z: Array of normalised pore pressures with shape (len(DepthArray), len(NondimensionalTime)).
+    """
+    depth = np.asarray(DepthArray, dtype=float)
+    time = np.asarray(NondimensionalTime, dtype=float)
+
+    iteration = np.arange(max_iterations)
+    MM = np.pi * ((2 * iteration) + 1) * 0.5
+    sign = np.where(iteration % 2 == 0, 1.0, -1.0)
+
+    # Blocks of whole time rows if they fit, otherwise blocks of depths of a single time
+    depth_chunk = max(1, min(len(depth), max_chunk_elements // max_iterations))
+    time_chunk = max(1, max_chunk_elements // (depth_chunk * max_iterations))
+
+    u_z = np.empty((len(depth), len(time)))
+    for depth_start in range(0, len(depth), depth_chunk):
+        depth_block = slice(depth_start, depth_start + depth_chunk)
+        for time_start in range(0, len(time), time_chunk):
+            time_block = slice(time_start, time_start + time_chunk)
+            u_z[depth_block, time_block] = _fourier_series_block(depth[depth_block], time[time_block], MM, sign,
+                                                                 DrainagePath, tolerance)
+    return u_z
+
+
+def _fourier_series_block(depth, time, MM, sign, DrainagePath, tolerance):
+    # Purpose: Sum the converged terms of the series for a block of depths and times
+    depth = depth[:, np.newaxis, np.newaxis]
+    time = time[np.newaxis, :, np.newaxis]
+
+    # Contribution of every term, shape (depth, time, term)
+    terms = (2 / MM) * sign * np.cos((MM * depth) / DrainagePath) * np.exp(-(MM ** 2) * time)
+
+    # A term is included if none of the terms before it had converged
+    not_converged = np.abs(terms) >= tolerance
+    included = np.ones_like(not_converged)
+    included[..., 1:] = np.cumprod(not_converged[..., :-1], axis=-1)
+
+    return np.sum(terms * included, axis=-1)
@@ -1,7 +1,6 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
-def terzaghi_settlement_solution(LayerDepth, TractionLoad, NondimensionalTime, YoungsModulus, PoissonRatio, tolerance=1e-10, max_iterations=30): 
+def terzaghi_settlement_solution(LayerDepth, TractionLoad, NondimensionalTime, YoungsModulus, PoissonRatio, tolerance=1e-10, max_iterations=30, return_error_bound=False):
     """
     Calculate the convergent values of UU with Fourier series until convergence is achieved.
 
@@ -13,35 +12,91 @@ def terzaghi_settlement_solution(LayerDepth, TractionLoad, NondimensionalTime, Y
     - NondimensionalTime: Array of non-dimensional times.
     - tolerance: Convergence tolerance.
     - max_iterations: Maximum number of iterations for convergence.
+    - return_error_bound: If True also return the absolute error bound of UU.
 
     Returns:
     - UU: The convergent array of values.
+    - UU_error (only if return_error_bound): Upper bound of the absolute error of each value in UU.
     """
 
 
-    OedometricModulus = YoungsModulus * (1 - PoissonRatio) / ((1 + PoissonRatio) * (1 - 2 * PoissonRatio)) # 1/YoungsModulus    
+    OedometricModulus = YoungsModulus * (1 - PoissonRatio) / ((1 + PoissonRatio) * (1 - 2 * PoissonRatio)) # 1/YoungsModulus
     Compressibility = 1 / OedometricModulus # m_v [=] m2/N
 
-    # Initialize the array to store results
-    UU = np.zeros(len(NondimensionalTime))  # An array of size NondimensionalTime with zeros
-    
-    # Loop until convergence for each value in NondimensionalTime
-    for kk in range(len(NondimensionalTime)):
-        converged = False
-        iteration = 0
-        while not converged and iteration < max_iterations:
-            MM = np.pi * ((2 * iteration) + 1) * 0.5
-            term = (2 / MM**2) * np.exp(-(MM**2) * NondimensionalTime[kk])
-            previous_value = UU[kk]
-            UU[kk] += term
-
-            # Check convergence
-            if np.abs(UU[kk] - previous_value) < tolerance:
-                converged = True
-            else:
-                iteration += 1
-
-        # Apply scaling factors
-        UU[kk] = (1 - UU[kk]) * LayerDepth * TractionLoad * Compressibility
+    # Calculate the degree of consolidation for all times at once
+    DegreeOfConsolidation, ErrorBound = terzaghi_degree_of_consolidation(NondimensionalTime, tolerance, max_iterations)
+
+    # Apply scaling factors
+    UU = DegreeOfConsolidation * LayerDepth * TractionLoad * Compressibility
+
+    if return_error_bound:
+        return UU, ErrorBound * np.abs(LayerDepth * TractionLoad * Compressibility)
 
     return UU  # Return the calculated values
+
+
+def terzaghi_degree_of_consolidation(NondimensionalTime, tolerance=1e-10, max_iterations=30):
+    """
+    Calculate the average degree of consolidation U(Tv) for an array of non-dimensional times.
+
+    For every time value the cheapest evaluation that is accurate to the tolerance is used:
+    - Small Tv: the short time asymptote U = sqrt(4Tv/pi).
+    - Large Tv: the first term of the series U = 1 - 8/pi^2 exp(-pi^2 Tv/4).
+    - Otherwise: the Fourier series, truncated per time value when the terms drop below the tolerance.
+
+    Parameters:
+    - NondimensionalTime: Array of non-dimensional times.
+    - tolerance: Convergence tolerance.
+    - max_iterations: Maximum number of terms used in the Fourier series.
+
+    Returns:
+    - DegreeOfConsolidation: Array of U values.
+    - ErrorBound: Upper bound of the absolute error of each U value.
+    """
+    NondimensionalTime = np.asarray(NondimensionalTime, dtype=float)
+    DegreeOfConsolidation = np.zeros(NondimensionalTime.shape)
+    ErrorBound = np.zeros(NondimensionalTime.shape)
+
+    # Error of the short time asymptote (the image series is alternating, so it is bounded by its first neglected term)
+    with np.errstate(divide='ignore', over='ignore'):
+        ShortTimeError = np.where(
+            NondimensionalTime > 0,
+            2 * NondimensionalTime ** 1.5 * np.exp(-1 / NondimensionalTime) / np.sqrt(np.pi),
+            0.0
+        )
+
+    # Error of the single term solution, the remaining terms sum to at most (1 - 8/pi^2) exp(-9 pi^2 Tv / 4)
+    SingleTermError = (1 - 8 / np.pi ** 2) * np.exp(-9 * np.pi ** 2 * NondimensionalTime / 4)
+
+    short_time = ShortTimeError < tolerance
+    single_term = ~short_time & (SingleTermError < tolerance)
+    series = ~short_time & ~single_term
+
+    # Short time asymptote
+    DegreeOfConsolidation[short_time] = np.sqrt(4 * NondimensionalTime[short_time] / np.pi)
+    ErrorBound[short_time] = ShortTimeError[short_time]
+
+    # Single term closed form
+    DegreeOfConsolidation[single_term] = 1 - (8 / np.pi ** 2) * np.exp(-(np.pi ** 2) * NondimensionalTime[single_term] / 4)
+    ErrorBound[single_term] = SingleTermError[single_term]
+
+    # Fourier series for the remaining times, shape (time, term)
+    if np.any(series):
+        time = NondimensionalTime[series][:, np.newaxis]
+        iteration = np.arange(max_iterations)
+        MM = np.pi * ((2 * iteration) + 1) * 0.5
+        terms = (2 / MM ** 2) * np.exp(-(MM ** 2) * time)
+
+        # A term is included if none of the terms before it had converged
+        not_converged = terms >= tolerance
+        included = np.ones_like(not_converged)
+        included[:, 1:] = np.cumprod(not_converged[:, :-1], axis=-1)
+        num_terms = np.sum(included, axis=-1)
+
+        DegreeOfConsolidation[series] = 1 - np.sum(terms * included, axis=-1)
+
+        # The neglected terms sum to at most 2 / (pi^2 N) exp(-M_N^2 Tv)
+        MM_next = np.pi * ((2 * num_terms) + 1) * 0.5
+        ErrorBound[series] = 2 / (np.pi ** 2 * num_terms) * np.exp(-(MM_next ** 2) * time[:, 0])
+
+    return DegreeOfConsolidation, ErrorBound
@@ -0,0 +1,152 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.figure import Figure
+
+from lib.general_functions.read_mpm_data import time_index
+
+# Same styles as plot_analytical_numerical_solutions
+LINE_STYLES = ["-", "--", ":", "-."]
+MARKERS = ["o", "s", "^", "d"]
+COLORS = ["r", "g", "b", "y", "m", "c"]
+
+
+class isochrone_figure:
+    # Purpose: Reusable figure of the analytical and numerical isochrones that is rendered without a display
+    # The artists are created once, each directory only updates the data of the numerical lines
+
+    def __init__(self, u_z, DepthArray, NondimensionalTime, TractionLoad):
+        if TractionLoad == 0:
+            raise ValueError("TractionLoad must not be zero.")
+
+        self.NondimensionalTime = np.asarray(NondimensionalTime, dtype=float)
+        self.TractionLoad = TractionLoad
+
+        # A Figure that isn't created through pyplot is never shown and doesn't need a display
+        self.figure = Figure(figsize=(10, 6))
+        self.axes = self.figure.add_subplot()
+
+        # Analytical solution, the same for every directory
+        for kk in range(len(self.NondimensionalTime)):
+            self.axes.plot(
+                u_z[:, kk],
+                DepthArray,
+                color='black',
+                linestyle=LINE_STYLES[kk % len(LINE_STYLES)],
+                marker=MARKERS[kk % len(MARKERS)],
+                markersize=4,
+                markerfacecolor='none',
+            )
+
+        # One line per target time holds the numerical points of all PAR files
+        self.numerical_lines = []
+        for j in range(len(self.NondimensionalTime)):
+            color = COLORS[j % len(COLORS)]
+            line, = self.axes.plot(
+                [], [],
+                linestyle='none',
+                marker='o',
+                markersize=6,
+                markerfacecolor='none',
+                markeredgecolor=color,
+                color=color,
+            )
+            self.numerical_lines.append(line)
+
+        self.axes.set_xlabel("Normalized Pore Pressure, $p/p_0$ (-)")
+        self.axes.set_ylabel("Depth, $Y$ (m)")
+        self.axes.grid(True)
+        self.title = self.axes.set_title("")
+
+    def update(self, dir_key, dataframes):
+        # Purpose: Show the numerical solution of one directory
+        required_columns = ["Time", "WPressure", "Y"]
+        pressures = []
+        depths = []
+        for key, df in dataframes.items():
+            if not all(col in df.columns for col in required_columns):
+                raise KeyError(f"Missing required columns in DataFrame '{key}'")
+
+            closest_indices = time_index(df["Time"]).nearest(self.NondimensionalTime)
+            pressures.append(df["WPressure"].to_numpy()[closest_indices] / self.TractionLoad)
+            depths.append(df["Y"].to_numpy()[closest_indices])
+
+        pressures = np.array(pressures).reshape(-1, len(self.NondimensionalTime))
+        depths = np.array(depths).reshape(-1, len(self.NondimensionalTime))
+        for j, line in enumerate(self.numerical_lines):
+            line.set_data(pressures[:, j], depths[:, j])
+
+        self.title.set_text(f"Depth vs. Normalized Pore Pressure - {dir_key}")
+        self.axes.relim()
+        self.axes.autoscale_view()
+
+    def save(self, file_path):
+        # Purpose: Write the figure, the format follows from the extension (e.g. .png or .svg)
+        self.figure.savefig(file_path)
+
+
+def get_figure_path(output_dir, index, dir_key, file_format):
+    # Purpose: Create a unique file name for the figure of a directory
+    name = re.sub(r"[^\w.-]", "_", os.path.basename(os.path.normpath(dir_key)))
+    return os.path.join(output_dir, f"{index:03d}_{name}.{file_format}")
+
+
+def _render_directories(jobs, u_z, DepthArray, NondimensionalTime, TractionLoad):
+    # Purpose: Render a group of directories with a single figure (runs in a worker process)
+    figure = isochrone_figure(u_z, DepthArray, NondimensionalTime, TractionLoad)
+    for dir_key, dataframes, file_path in jobs:
+        figure.update(dir_key, dataframes)
+        figure.save(file_path)
+    return [file_path for _, _, file_path in jobs]
+
+
+def render_validation_figures(par_dataframes_by_directory, u_z, DepthArray, NondimensionalTime, TractionLoad,
+                              output_dir, file_format="png", max_workers=None):
+    """
+    Write the analytical vs numerical isochrone figure of each directory to a file without a display.
+
+    Parameters:
+    - par_dataframes_by_directory: Dictionary with DataFrames from different directories.
+    - u_z: Analytical solution data.
+    - DepthArray: Array representing depths.
+    - NondimensionalTime: Array of non-dimensional times.
+    - TractionLoad: Traction load for normalization.
+    - output_dir: Directory the figures are written to.
+    - file_format: File format of the figures, e.g. "png" or "svg".
+    - max_workers: Number of processes that render figures. Defaults to the number of cores, 1 renders in this process.
+
+    Returns:
+    - A dictionary of directory key to the path of its figure.
+    """
+    if TractionLoad == 0:
+        raise ValueError("TractionLoad must not be zero.")
+
+    if not par_dataframes_by_directory:
+        raise ValueError("The provided 'par_dataframes_by_directory' is empty.")
+
+    os.makedirs(output_dir, exist_ok=True)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    jobs = [
+        (dir_key, dataframes, get_figure_path(output_dir, i, dir_key, file_format))
+        for i, (dir_key, dataframes) in enumerate(par_dataframes_by_directory.items())
+    ]
+
+    # Give each worker one group of directories so it only creates one figure
+    num_groups = max(1, min(max_workers, len(jobs)))
+    groups = [jobs[i::num_groups] for i in range(num_groups)]
+
+    if num_groups == 1:
+        _render_directories(jobs, u_z, DepthArray, NondimensionalTime, TractionLoad)
+    else:
+        with ProcessPoolExecutor(max_workers=num_groups) as executor:
+            futures = [
+                executor.submit(_render_directories, group, u_z, DepthArray, NondimensionalTime, TractionLoad)
+                for group in groups
+            ]
+            for future in futures:
+                future.result()
+
+    return {dir_key: file_path for dir_key, _, file_path in jobs}
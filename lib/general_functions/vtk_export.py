@@ -0,0 +1,285 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from xml.sax.saxutils import quoteattr
+import numpy as np
+import pandas as pd
+
+from lib.general_functions.read_mpm_data import find_par_files, get_par_key
+from lib.general_functions.compressed_io import open_result_file
+from lib.general_functions.mp_result_reader import mp_result_reader, read_rows
+
+# VTK cell types of the GOM elements by (dimension, nodes per element)
+VTK_CELL_TYPES = {(2, 3): 5, (2, 4): 9, (3, 4): 10, (3, 8): 12}
+VTK_VERTEX = 1
+
+# VTK names of the NumPy types that are written
+VTK_DATA_TYPES = {"f8": "Float64", "i8": "Int64", "u1": "UInt8"}
+
+
+def _atomic_write(file_path, write):
+    # Purpose: Write a file through a temporary file in the same folder, so a reader never sees a half written file
+    directory = os.path.dirname(os.path.abspath(file_path))
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".vtk_write_")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            write(file)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_vtu(file_path, points, cells, cell_type, point_data=None, cell_data=None):
+    """
+    Write an unstructured grid to a binary .vtu file (raw appended data, readable by ParaView).
+
+    Parameters:
+    - file_path: Path of the .vtu file.
+    - points: The point coordinates (num_points x 2 or 3), 2D points get z = 0.
+    - cells: The 0-based connectivity of the cells (num_cells x nodes per cell), all cells have the same type.
+    - cell_type: The VTK cell type (e.g. 5 for triangles, see VTK_CELL_TYPES).
+    - point_data: Optional dictionary of name to values (num_points, or num_points x components).
+    - cell_data: Optional dictionary of name to values (num_cells, or num_cells x components).
+    """
+    points = np.asarray(points, dtype="<f8")
+    if points.shape[1] == 2:
+        points = np.column_stack([points, np.zeros(len(points))])
+    cells = np.asarray(cells, dtype="<i8")
+
+    # The arrays in the order they are appended: (section, name, values)
+    arrays = [("PointData", name, values) for name, values in (point_data or {}).items()]
+    arrays += [("CellData", name, values) for name, values in (cell_data or {}).items()]
+    arrays += [("Points", None, points),
+               ("Cells", "connectivity", cells.ravel()),
+               ("Cells", "offsets", np.arange(1, len(cells) + 1, dtype="<i8") * cells.shape[1]),
+               ("Cells", "types", np.full(len(cells), cell_type, dtype="u1"))]
+
+    blocks = []
+    sections = {"PointData": [], "CellData": [], "Points": [], "Cells": []}
+    offset = 0
+    for section, name, values in arrays:
+        values = np.asarray(values)
+        values = values.astype("<f8") if values.dtype.kind == "f" or section in ("PointData", "CellData") else values
+        components = 1 if values.ndim == 1 else values.shape[1]
+        attributes = f'type="{VTK_DATA_TYPES[values.dtype.str[1:]]}"'
+        if name is not None:
+            attributes += f" Name={quoteattr(name)}"
+        if components > 1:
+            attributes += f' NumberOfComponents="{components}"'
+        sections[section].append(f'        <DataArray {attributes} format="appended" offset="{offset}"/>')
+
+        data = np.ascontiguousarray(values).tobytes()
+        blocks.append(data)
+        offset += 8 + len(data)
+
+    lines = ['<?xml version="1.0"?>',
+             '<VTKFile type="UnstructuredGrid" version="1.0" byte_order="LittleEndian" header_type="UInt64">',
+             '  <UnstructuredGrid>',
+             f'    <Piece NumberOfPoints="{len(points)}" NumberOfCells="{len(cells)}">']
+    for section, arrays_xml in sections.items():
+        if arrays_xml or section in ("Points", "Cells"):
+            lines += [f"      <{section}>"] + arrays_xml + [f"      </{section}>"]
+    lines += ['    </Piece>', '  </UnstructuredGrid>', '  <AppendedData encoding="raw">', '   _']
+
+    def write(file):
+        file.write("\n".join(lines).encode())
+        for data in blocks:
+            file.write(np.uint64(len(data)).tobytes())
+            file.write(data)
+        file.write(b"\n  </AppendedData>\n</VTKFile>\n")
+
+    _atomic_write(file_path, write)
+
+
+def write_pvd(file_path, entries):
+    """
+    Write a .pvd collection that lets ParaView open a series of .vtu files as one time series.
+
+    Parameters:
+    - file_path: Path of the .pvd file.
+    - entries: A list of (time, .vtu path) tuples, the paths are stored relative to the .pvd file.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    lines = ['<?xml version="1.0"?>',
+             '<VTKFile type="Collection" version="1.0" byte_order="LittleEndian">',
+             '  <Collection>']
+    for time, vtu_path in entries:
+        relative_path = os.path.relpath(os.path.abspath(vtu_path), directory).replace(os.sep, "/")
+        lines.append(f'    <DataSet timestep="{time!r}" part="0" file={quoteattr(relative_path)}/>')
+    lines += ['  </Collection>', '</VTKFile>', '']
+
+    _atomic_write(file_path, lambda file: file.write("\n".join(lines).encode()))
+
+
+def write_mesh_vtu(file_path, gom):
+    # Purpose: Write the mesh of a gom_file to a .vtu file with the material number of each element
+    cell_type = VTK_CELL_TYPES.get((gom.nodes.shape[1], gom.elements.shape[1]))
+    if cell_type is None:
+        raise ValueError(f"No VTK cell type for {gom.elements.shape[1]}-noded elements in {gom.nodes.shape[1]}D")
+
+    cell_data = {}
+    materials = gom.get_section("STARTELMMAT")
+    if materials is not None:
+        cell_data["Material"] = np.fromstring(materials, dtype=float, sep=" ")[:len(gom.elements)]
+    write_vtu(file_path, gom.nodes, gom.elements - 1, cell_type, cell_data=cell_data)
+
+
+def write_point_cloud_vtu(file_path, values, columns, coordinate_columns=("X", "Y")):
+    # Purpose: Write the rows of a step as vertices with every other column as point data
+    values = np.asarray(values)
+    coordinate_indices = [columns.index(name) for name in coordinate_columns]
+    point_data = {name: values[:, i] for i, name in enumerate(columns) if name not in coordinate_columns}
+    write_vtu(file_path, values[:, coordinate_indices], np.arange(len(values))[:, None], VTK_VERTEX, point_data=point_data)
+
+
+def _step_file_name(prefix, step):
+    return f"{prefix}_{step:06d}.vtu"
+
+
+class _bounded_writer:
+    # Purpose: Run the writes of the steps on an executor with a limited number of steps in memory
+
+    def __init__(self, max_workers=None, use_processes=False):
+        self.max_workers = max_workers or 1
+        self.executor = (ProcessPoolExecutor if use_processes else ThreadPoolExecutor)(max_workers=self.max_workers)
+        self.pending = set()
+
+    def submit(self, function, *arguments):
+        # Wait for a write to finish if the window is full, so a fast reader can't fill the memory
+        while len(self.pending) >= 2 * self.max_workers:
+            done, self.pending = wait(self.pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+        self.pending.add(self.executor.submit(function, *arguments))
+
+    def close(self):
+        try:
+            for future in self.pending:
+                future.result()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+
+
+def export_par_results(directory, output_dir, variables=None, file_pattern_suffix="PAR_*", coordinate_columns=("X", "Y"),
+                       time_column="Time", chunksize=10000, max_workers=None, use_processes=False, gom=None):
+    """
+    Export the PAR files of a model as a time series of point clouds for ParaView.
+
+    Each PAR file follows one material point, so step k of the export holds row k of every PAR file. The files
+    are read together in chunks of rows, so the memory use doesn't grow with the number of steps.
+
+    Parameters:
+    - directory: The .A3D folder with the PAR files (can be compressed or inside of a zip archive).
+    - output_dir: The folder the .vtu files and the .pvd file are written to.
+    - variables: The columns to export, all columns if None. The coordinate and time columns are always read.
+    - file_pattern_suffix: Suffix for the file pattern to find the PAR files.
+    - coordinate_columns: The columns with the coordinates of the material points.
+    - time_column: The column with the time of each row.
+    - chunksize: Number of rows of each PAR file that are held in memory.
+    - max_workers: Number of steps that are written at the same time.
+    - use_processes: Write the steps in processes instead of threads.
+    - gom: Optional gom_file of the model, its mesh is written to mesh.vtu.
+
+    Returns:
+    - The path of the .pvd file.
+    """
+    files = find_par_files(directory, file_pattern_suffix)
+    if not files:
+        raise FileNotFoundError(f"No files matching '{file_pattern_suffix}' found in '{directory}'")
+    files.sort(key=lambda file: get_par_key(file))
+    os.makedirs(output_dir, exist_ok=True)
+    if gom is not None:
+        write_mesh_vtu(os.path.join(output_dir, "mesh.vtu"), gom)
+
+    columns = None
+    if variables is not None:
+        columns = list(dict.fromkeys(list(coordinate_columns) + [time_column] + list(variables)))
+
+    streams = [open_result_file(file) for file in files]
+    readers = [pd.read_csv(stream, sep=r"\s+", usecols=columns, chunksize=chunksize) for stream in streams]
+    writer = _bounded_writer(max_workers, use_processes)
+    entries = []
+    step = 0
+    try:
+        # The PAR files are written at the same times, so they are read in step
+        for chunks in zip(*readers):
+            names = list(chunks[0].columns)
+            rows = min(len(chunk) for chunk in chunks)
+            values = np.stack([chunk[names].to_numpy(dtype=float)[:rows] for chunk in chunks], axis=1)
+            times = values[:, 0, names.index(time_column)]
+
+            for row in range(rows):
+                vtu_path = os.path.join(output_dir, _step_file_name("par", step))
+                writer.submit(write_point_cloud_vtu, vtu_path, values[row], names, coordinate_columns)
+                entries.append((float(times[row]), vtu_path))
+                step += 1
+    finally:
+        writer.close()
+        for reader, stream in zip(readers, streams):
+            reader.close()
+            stream.close()
+
+    pvd_path = os.path.join(output_dir, "par.pvd")
+    write_pvd(pvd_path, entries)
+    return pvd_path
+
+
+def _export_mp_step(file_path, start, end, num_rows, num_columns, column_indices, names, coordinate_columns, vtu_path):
+    # Purpose: Parse one step of a material point result file from its byte offsets and write it, runs on a worker
+    values = read_rows(file_path, start, end, num_rows, num_columns)[:, column_indices]
+    write_point_cloud_vtu(vtu_path, values, names, coordinate_columns)
+
+
+def export_mp_results(file_path, output_dir, variables=None, coordinate_columns=("X", "Y"), step_column="Time", steps=None,
+                      max_workers=None, use_processes=False, gom=None):
+    """
+    Export a material point result file (see mp_result_reader) as a time series of point clouds for ParaView.
+
+    Every step is read on its own from the step index, so only the steps that are being written are in memory.
+
+    Parameters:
+    - file_path: The material point result file.
+    - output_dir: The folder the .vtu files and the .pvd file are written to.
+    - variables: The columns to export, all columns if None. The coordinate columns are always read.
+    - coordinate_columns: The columns with the coordinates of the material points.
+    - step_column: The column with the same value for all rows of a step.
+    - steps: Optional list of step numbers to export, all steps if None.
+    - max_workers: Number of steps that are read and written at the same time.
+    - use_processes: Read and write the steps in processes instead of threads.
+    - gom: Optional gom_file of the model, its mesh is written to mesh.vtu.
+
+    Returns:
+    - The path of the .pvd file.
+    """
+    # Build the step index once, the workers only get the byte offsets of their step
+    reader = mp_result_reader(file_path, step_column)
+    names = reader.columns
+    if variables is not None:
+        names = list(dict.fromkeys(list(coordinate_columns) + list(variables)))
+    column_indices = reader.column_indices(names)
+
+    os.makedirs(output_dir, exist_ok=True)
+    if gom is not None:
+        write_mesh_vtu(os.path.join(output_dir, "mesh.vtu"), gom)
+
+    writer = _bounded_writer(max_workers, use_processes)
+    entries = []
+    try:
+        for step in (range(reader.num_steps) if steps is None else steps):
+            vtu_path = os.path.join(output_dir, _step_file_name("mp", step))
+            if reader.has_binary:
+                # The step is a view of the memory-mapped binary copy, there is nothing to parse
+                writer.submit(write_point_cloud_vtu, vtu_path, reader.read_step_array(step, names), names, coordinate_columns)
+            else:
+                num_rows = int(reader.step_rows[step + 1] - reader.step_rows[step])
+                writer.submit(_export_mp_step, file_path, int(reader.step_offsets[step]), int(reader.step_offsets[step + 1]),
+                              num_rows, len(reader.columns), column_indices, names, coordinate_columns, vtu_path)
+            entries.append((float(reader.step_values[step]), vtu_path))
+    finally:
+        writer.close()
+
+    pvd_path = os.path.join(output_dir, "mp.pvd")
+    write_pvd(pvd_path, entries)
+    return pvd_path
@@ -0,0 +1,42 @@
+import os
+import sys
+import stat
+
+import pytest
+
+# Run the tests from any folder with the lib package of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STUB_KERNEL = """#!{python}
+# Stub of the Anura3D kernel: runs the CPS file with the highest number like the real kernel
+import os, re, sys
+model_path = sys.argv[1]
+folder, name = os.path.split(model_path)
+numbers = [int(m.group(1)) for f in os.listdir(folder) if (m := re.match(re.escape(name) + r"\\.CPS_(\\d+)$", f))]
+stage = max(numbers)
+with open(os.path.join(os.path.dirname(folder), "kernel_calls.txt"), "a") as log:
+    log.write(f"{{name}}.CPS_{{stage:03d}}\\n")
+with open(f"{{model_path}}.CPS_{{stage:03d}}") as source, open(f"{{model_path}}.CPS_{{stage + 1:03d}}", "w") as target:
+    target.write(source.read())
+with open(f"{{model_path}}.PAR_001", "a") as par:
+    par.write(f"stage {{stage}}\\n")
+"""
+
+
+@pytest.fixture
+def stub_model_folder(tmp_path):
+    # Purpose: A model folder with a CPS_001, a GOM file and the stub kernel
+    folder = tmp_path / "Stub.A3D"
+    folder.mkdir()
+    (folder / "Stub.CPS_001").write_text("### Anura3D_2024 ###\n$$NUMBER_OF_LOADSTEPS\n2\n$$TIME_PER_LOADSTEP\n0.05\n")
+    (folder / "Stub.GOM").write_text("### Anura3D_2024 ###\n")
+    kernel = folder / "kernel"
+    kernel.write_text(STUB_KERNEL.format(python=sys.executable))
+    kernel.chmod(kernel.stat().st_mode | stat.S_IEXEC)
+    return folder
+
+
+def kernel_calls(folder):
+    # Purpose: Get the CPS files that the stub kernel ran, in order (the log is next to the model folder)
+    calls = folder.parent / "kernel_calls.txt"
+    return calls.read_text().split() if calls.exists() else []
@@ -0,0 +1,132 @@
+import numpy as np
+
+from lib.data_classes.GiD import GID_MESHSET_END, GID_MESHSET_MAGIC, NODE_RECORD, gid_project
+
+# Last calculate: a unit square of two materials (x < 0.5 and x > 0.5) with 4 triangles
+TEMPLATE_GOM = """### Anura3D_2024 ###
+$$DIMENSION
+2D-plane_strain
+$$ELEMENTTYPE
+triangular_3-noded
+$$STARTCOUNTERS
+4 6
+$$STARTNODES
+0.0 0.0
+0.5 0.0
+1.0 0.0
+0.0 1.0
+0.5 1.0
+1.0 1.0
+$$STARTELEMCON
+1 2 5
+1 5 4
+2 3 6
+2 6 5
+$$START_FIXITY_LINE_SOLID
+5
+1 0 1
+2 0 1
+3 0 1
+1 1 0
+4 1 0
+$$START_LOAD_ON_MATERIAL_POINTS_SOLID
+2
+4 5 0.0 -10 0.0 -15
+5 6 0.0 -15 0.0 -20
+$$START_OUTPUT_REACTION_FORCES
+0
+$$STARTELMMAT
+1
+1
+2
+2
+$$START_NUMBER_OF_MATERIAL_POINTS
+3 0
+3 0
+6 0
+6 0
+$$FINISH
+"""
+
+
+def write_gid_mesh(file_path, nodes, blocks, point_nodes):
+    # Purpose: Write a binary GiD mesh (GID_MESHSET) of triangles, the layout read by gid_mesh_file
+    name = GID_MESHSET_MAGIC + b"\0"
+    records = np.zeros(len(nodes), dtype=NODE_RECORD)
+    records["id"] = np.arange(1, len(nodes) + 1)
+    records["coordinates"][:, :2] = nodes
+
+    words = [0]
+    element_id = 1
+    for number, connectivity in enumerate(blocks, start=1):
+        words += [3, 2, 3, len(nodes), len(connectivity), 0]
+        for element in connectivity:
+            words += [element_id, 0, 0, 0, 0, 0, 1, 0] + list(element)
+            element_id += 1
+        words += [0, 1, 3, number]
+    words += [0, len(point_nodes)]
+    for point_id, node_id in point_nodes:
+        words += [1, node_id, point_id]
+
+    with open(file_path, "wb") as file:
+        file.write(np.array([0, 0, len(name)], dtype="<i4").tobytes() + name)
+        file.write(np.array([len(nodes)], dtype="<i4").tobytes() + records.tobytes())
+        file.write(np.array(words, dtype="<i4").tobytes() + GID_MESHSET_END)
+
+
+def create_remeshed_project(folder):
+    # Purpose: A project meshed again after the last calculate, a 5 x 3 grid of nodes with a block per material
+    folder.mkdir()
+    (folder / "Square-1.dat").write_text("### Anura3D_2024 ###\n$$NUMBER_OF_LOADSTEPS\n1\n")
+    (folder / "Square-2.dat").write_text(TEMPLATE_GOM)
+
+    x, y = np.meshgrid([0.0, 0.25, 0.5, 0.75, 1.0], [0.0, 0.5, 1.0])
+    nodes = np.column_stack([x.ravel(), y.ravel()])
+    blocks = [[], []]
+    for row in range(2):
+        for column in range(4):
+            a, b = row * 5 + column + 1, row * 5 + column + 2
+            c, d = a + 5, b + 5
+            blocks[column // 2] += [(a, b, d), (a, d, c)]
+
+    # Geometric points at the corners and the ends of the line between the materials
+    point_nodes = [(1, 1), (2, 3), (3, 5), (4, 11), (5, 13), (6, 15)]
+    write_gid_mesh(folder / "Square.msh", nodes, blocks, point_nodes)
+    return nodes
+
+
+def test_to_gom_moves_the_sections_to_a_new_mesh(tmp_path):
+    nodes = create_remeshed_project(tmp_path / "Square.gid")
+    gom = gid_project(str(tmp_path / "Square.gid")).to_gom()
+
+    assert np.array_equal(gom.nodes, nodes)
+    assert gom.elements.shape == (16, 3)
+
+    # The bottom nodes keep the y fixity and the left nodes the x fixity
+    fixities = gom.get_section("START_FIXITY_LINE_SOLID").split("\n")
+    assert fixities == ["8", "1 0 1", "1 1 0", "2 0 1", "3 0 1", "4 0 1", "5 0 1", "6 1 0", "11 1 0"]
+
+    # The top load is split over the new edges and interpolated along the old ones
+    loads = gom.get_section("START_LOAD_ON_MATERIAL_POINTS_SOLID").split("\n")
+    assert loads[0] == "4"
+    assert sorted(loads[1:]) == sorted([
+        "11 12 0 -10 0 -12.5",
+        "12 13 0 -12.5 0 -15",
+        "13 14 0 -15 0 -17.5",
+        "14 15 0 -17.5 0 -20",
+    ])
+
+    # Each block gets the material of the old elements it covers
+    assert gom.get_section("STARTELMMAT").split("\n") == ["1"] * 8 + ["2"] * 8
+    assert gom.get_section("START_NUMBER_OF_MATERIAL_POINTS").split("\n") == ["3 0"] * 8 + ["6 0"] * 8
+
+
+def test_to_gom_keeps_the_sections_of_the_same_mesh(tmp_path):
+    folder = tmp_path / "Square.gid"
+    create_remeshed_project(folder)
+    write_gid_mesh(folder / "Square.msh", np.array([[0, 0], [0.5, 0], [1, 0], [0, 1], [0.5, 1], [1, 1]], dtype=float),
+                   [[(1, 2, 5), (1, 5, 4)], [(2, 3, 6), (2, 6, 5)]], [(1, 1), (2, 3), (3, 4), (4, 6)])
+
+    gom = gid_project(str(folder)).to_gom()
+    assert gom.get_section("START_FIXITY_LINE_SOLID").split("\n")[0] == "5"
+    assert gom.get_section("STARTELMMAT").split("\n") == ["1", "1", "2", "2"]
@@ -0,0 +1,72 @@
+import os
+
+from conftest import kernel_calls
+from lib.data_classes.Model import model
+from lib.general_functions.result_cache import result_cache
+
+
+def create_stub_model(folder, num_stages=3):
+    stub_model = model(str(folder / "kernel"), str(folder), "Stub", benchmark=False)
+    stub_model.num_stages = num_stages
+    stub_model.benchmark_info = {"stage_cps_flags": [{} for _ in range(num_stages)]}
+    return stub_model
+
+
+def test_run_benchmark_runs_each_stage_file(stub_model_folder):
+    create_stub_model(stub_model_folder).run_benchmark()
+    assert kernel_calls(stub_model_folder) == ["Stub.CPS_001", "Stub.CPS_002", "Stub.CPS_003"]
+
+
+def test_resume_skips_unchanged_stages(stub_model_folder):
+    create_stub_model(stub_model_folder).run_benchmark()
+    create_stub_model(stub_model_folder).run_benchmark()
+    assert len(kernel_calls(stub_model_folder)) == 3
+
+
+def test_edited_first_stage_reruns_from_its_own_cps_file(stub_model_folder):
+    create_stub_model(stub_model_folder).run_benchmark()
+
+    cps_path = stub_model_folder / "Stub.CPS_001"
+    cps_path.write_text(cps_path.read_text().replace("0.05", "0.1"))
+    create_stub_model(stub_model_folder).run_benchmark()
+
+    assert kernel_calls(stub_model_folder)[3:] == ["Stub.CPS_001", "Stub.CPS_002", "Stub.CPS_003"]
+    assert sorted(name for name in os.listdir(stub_model_folder) if ".CPS_" in name) == \
+        ["Stub.CPS_001", "Stub.CPS_002", "Stub.CPS_003", "Stub.CPS_004"]
+    # The PAR file of the first run was removed with the results of stage 1
+    assert (stub_model_folder / "Stub.PAR_001").read_text().split("\n")[:-1] == ["stage 1", "stage 2", "stage 3"]
+
+
+def test_deleted_result_files_rerun_the_stage(stub_model_folder):
+    create_stub_model(stub_model_folder).run_benchmark()
+    os.remove(stub_model_folder / "Stub.PAR_001")
+    create_stub_model(stub_model_folder).run_benchmark()
+    assert kernel_calls(stub_model_folder)[3:] == ["Stub.CPS_001", "Stub.CPS_002", "Stub.CPS_003"]
+
+
+def test_cached_run_starts_from_the_input_files(stub_model_folder, tmp_path):
+    create_stub_model(stub_model_folder).run_benchmark()
+
+    cache = result_cache(str(tmp_path / "cache"))
+    assert create_stub_model(stub_model_folder).run_benchmark_cached(cache) is False
+    assert kernel_calls(stub_model_folder)[3:] == ["Stub.CPS_001", "Stub.CPS_002", "Stub.CPS_003"]
+
+
+def test_cache_key_depends_on_the_kernel_libraries(stub_model_folder, tmp_path):
+    cache = result_cache(str(tmp_path / "cache"))
+    stub_model = create_stub_model(stub_model_folder)
+    key = cache.model_key(stub_model)
+
+    (stub_model_folder / "A3DLinearElasticity.dll").write_bytes(b"version 1")
+    assert cache.model_key(stub_model) != key
+
+
+def test_cache_entry_with_missing_files_is_a_miss(stub_model_folder, tmp_path):
+    cache = result_cache(str(tmp_path / "cache"))
+    stub_model = create_stub_model(stub_model_folder)
+    stub_model.run_benchmark_cached(cache)
+    key = cache.model_key(stub_model)
+
+    os.remove(os.path.join(cache.cache_dir, key, "files", "Stub.PAR_001"))
+    assert cache.restore(key, str(stub_model_folder)) is False
+    assert key not in cache.entries()
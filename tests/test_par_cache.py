@@ -0,0 +1,25 @@
+import os
+
+from lib.general_functions.par_cache import get_par_cache_dir, load_par_cache, read_par_file
+
+
+def write_par(file_path, values):
+    with open(file_path, "w") as file:
+        file.write("Time Uy\n" + "".join(f"{i} {value}\n" for i, value in enumerate(values)))
+    # Make sure the rewrite has a new modification time
+    os.utime(file_path, ns=(os.stat(file_path).st_atime_ns, os.stat(file_path).st_mtime_ns + 10 ** 9))
+
+
+def test_rewrite_keeps_mapped_columns_intact(tmp_path):
+    file_path = str(tmp_path / "Foo.PAR_001")
+    write_par(file_path, [0, -1, -2])
+    read_par_file(file_path)
+    mapped = load_par_cache(file_path)["Uy"]
+
+    write_par(file_path, [5, 6, 7, 8])
+    assert list(read_par_file(file_path)["Uy"]) == [5, 6, 7, 8]
+    assert list(load_par_cache(file_path)["Uy"]) == [5, 6, 7, 8]
+    assert list(mapped) == [0, -1, -2]
+
+    # Only the columns of the last write are left
+    assert len([name for name in os.listdir(get_par_cache_dir(file_path)) if name.startswith("col_")]) == 2
@@ -0,0 +1,41 @@
+from lib.general_functions.par_tail_reader import par_tail_reader
+
+
+def write_rows(file_path, rows, mode="w"):
+    with open(file_path, mode) as file:
+        if mode == "w":
+            file.write("Time Uy\n")
+        file.write("".join(f"{time} {value}\n" for time, value in rows))
+
+
+def test_appended_rows_are_read(tmp_path):
+    file_path = tmp_path / "Foo.PAR_001"
+    write_rows(file_path, [(0.0, 0.0), (0.1, -0.1)])
+    reader = par_tail_reader(str(file_path))
+    assert reader.update() == 2
+
+    write_rows(file_path, [(0.2, -0.2)], mode="a")
+    assert reader.update() == 1
+    assert reader.get("Uy").tolist() == [0.0, -0.1, -0.2]
+
+
+def test_shorter_rewrite_is_read_from_the_start(tmp_path):
+    file_path = tmp_path / "Foo.PAR_001"
+    write_rows(file_path, [(0.0, 0.0), (0.1, -0.1), (0.2, -0.2)])
+    reader = par_tail_reader(str(file_path))
+    reader.update()
+
+    write_rows(file_path, [(0.0, 1.0)])
+    assert reader.update() == 1
+    assert reader.get("Uy").tolist() == [1.0]
+
+
+def test_larger_rewrite_is_read_from_the_start(tmp_path):
+    file_path = tmp_path / "Foo.PAR_001"
+    write_rows(file_path, [(0.0, 0.0), (0.1, -0.1)])
+    reader = par_tail_reader(str(file_path))
+    reader.update()
+
+    write_rows(file_path, [(0.0, 10.0), (0.1, 11.0), (0.2, 12.0), (0.3, 13.0)])
+    assert reader.update() == 4
+    assert reader.get("Uy").tolist() == [10.0, 11.0, 12.0, 13.0]
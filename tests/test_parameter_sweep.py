@@ -0,0 +1,20 @@
+from lib.data_classes.CPS import cps_file
+from lib.general_functions.parameter_sweep import create_sweep
+
+
+def test_sweep_can_be_created_again(stub_model_folder, tmp_path):
+    sweep_dir = tmp_path / "sweep"
+    variants = [{"TIME_PER_LOADSTEP": 0.1}, {"TIME_PER_LOADSTEP": 0.2}]
+    first = create_sweep(str(stub_model_folder / "kernel"), str(stub_model_folder), "Stub", variants, str(sweep_dir))
+
+    # Results of the first run are left in the variant folders
+    (sweep_dir / "variant_000" / "Stub.A3D" / "Stub.PAR_001").write_text("stage 1\n")
+
+    second = create_sweep(str(stub_model_folder / "kernel"), str(stub_model_folder), "Stub",
+                          [{"TIME_PER_LOADSTEP": 0.3}, {"TIME_PER_LOADSTEP": 0.4}], str(sweep_dir))
+
+    assert [m.model_folder for m in second] == [m.model_folder for m in first]
+    assert not (sweep_dir / "variant_000" / "Stub.A3D" / "Stub.PAR_001").exists()
+    assert [cps_file(f"{m.model_path}.CPS_001").get("TIME_PER_LOADSTEP", float) for m in second] == [0.3, 0.4]
+    # The base model is unchanged
+    assert cps_file(str(stub_model_folder / "Stub.CPS_001")).get("TIME_PER_LOADSTEP", float) == 0.05
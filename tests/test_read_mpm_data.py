@@ -0,0 +1,71 @@
+import zipfile
+
+import pytest
+
+from lib.general_functions.par_cache import read_par_file
+from lib.general_functions.read_mpm_data import process_parfiles_parallel, read_par_data, read_par_window
+
+
+def create_run_archive(tmp_path):
+    # Purpose: A zip archive with a .A3D folder with two PAR files
+    archive = tmp_path / "runs.zip"
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        for number in (1, 2):
+            zip_file.writestr(f"R.A3D/R.PAR_{number:03d}", "Time Uy\n0.0 0.0\n0.1 -0.5\n")
+    return str(archive / "R.A3D")
+
+
+def test_parallel_read_from_zip_archive(tmp_path):
+    directory = create_run_archive(tmp_path)
+    data, summary = process_parfiles_parallel([directory], max_workers=2)
+
+    assert summary["directories"] == [{"directory": directory, "num_files": 2, "error": None}]
+    serial = read_par_data(directory)
+    assert sorted(data[directory]) == sorted(serial)
+    for key, df in serial.items():
+        assert data[directory][key]["Uy"].tolist() == df["Uy"].tolist() == [0.0, -0.5]
+
+
+def test_parallel_read_reports_missing_directory(tmp_path):
+    directory = str(tmp_path / "Missing.A3D")
+    data, summary = process_parfiles_parallel([directory])
+
+    assert data == {}
+    assert summary["directories"][0]["num_files"] == 0
+    assert "does not exist" in summary["directories"][0]["error"]
+
+
+def write_par(file_path, times):
+    with open(file_path, "w") as file:
+        file.write("Time Uy\n" + "".join(f"{time} {-i}\n" for i, time in enumerate(times)))
+    return str(file_path)
+
+
+@pytest.mark.parametrize("times", [
+    [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6],
+    # Not sorted across the chunks, the window stops at the first row after it that follows sorted rows
+    [0.0, 0.1, 0.4, 0.2, 0.3, 0.5, 0.2, 0.6],
+    [0.3, 0.0, 0.1, 0.2, 0.5, 0.25],
+])
+def test_window_is_the_same_with_and_without_cache(tmp_path, times):
+    file_path = write_par(tmp_path / "Foo.PAR_001", times)
+    read_par_file(file_path)
+
+    expected = read_par_window(file_path, ["Uy"], (0.1, 0.3), use_cache=True)["Uy"].tolist()
+    for chunksize in (1, 2, 3, 100):
+        assert read_par_window(file_path, ["Uy"], (0.1, 0.3), chunksize=chunksize, use_cache=False)["Uy"].tolist() == expected
+
+
+def test_window_of_sorted_file(tmp_path):
+    file_path = write_par(tmp_path / "Foo.PAR_001", [0.0, 0.1, 0.2, 0.3, 0.4])
+    assert read_par_window(file_path, ["Uy"], (0.1, 0.3), chunksize=2, use_cache=False)["Uy"].tolist() == [-1, -2, -3]
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_window_missing_column_raises_key_error(tmp_path, use_cache):
+    file_path = write_par(tmp_path / "Foo.PAR_001", [0.0, 0.1])
+    read_par_file(file_path)
+    with pytest.raises(KeyError, match="Missing variables"):
+        read_par_window(file_path, ["Ux"], (0.0, 0.1), use_cache=use_cache)
+    with pytest.raises(KeyError, match="Missing variables"):
+        read_par_window(file_path, None, (0.0, 0.1), time_column="T", use_cache=use_cache)